@@ -0,0 +1,278 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+import tag_utils
+import tag_caching
+import tag_edit
+import tag_rules
+import tag_lint
+
+# Headless tagging of scene files, to run with mayapy :
+# mayapy batch.py shot_010.ma shot_020.mb --add "smooth, s02" --jobs 4
+
+
+class OperationAction(argparse.Action):
+    """
+    Store the tag operations in the order they are given on the command line
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        operations = getattr(namespace, self.dest) or []
+        operations.append((self.const, values))
+        setattr(namespace, self.dest, operations)
+
+
+def parse_arguments(arguments: list):
+    parser = argparse.ArgumentParser(
+        description="Apply GuerillaTags operations to Maya scene files"
+    )
+    parser.add_argument("files", nargs="+", help=".ma / .mb files to process")
+    parser.add_argument(
+        "--add",
+        dest="operations",
+        action=OperationAction,
+        const="add",
+        metavar="TAGS",
+        help="Add the comma separated tags",
+    )
+    parser.add_argument(
+        "--delete",
+        dest="operations",
+        action=OperationAction,
+        const="delete",
+        metavar="TAGS",
+        help="Delete the comma separated tags",
+    )
+    parser.add_argument(
+        "--replace",
+        dest="operations",
+        action=OperationAction,
+        const="replace",
+        metavar="OLD=NEW",
+        help="Replace the comma separated OLD tags by the NEW ones",
+    )
+    parser.add_argument(
+        "--merge",
+        dest="operations",
+        action=OperationAction,
+        const="merge",
+        metavar="OLD=NEW",
+        help="Rename the comma separated OLD tags to the NEW tag, keeping their place",
+    )
+    parser.add_argument(
+        "--subdiv",
+        dest="operations",
+        action=OperationAction,
+        const="subdiv",
+        choices=tag_edit.SUBDIV_TAGS,
+        help="Set the subdivision tag",
+    )
+    parser.add_argument(
+        "--exclusive",
+        dest="operations",
+        action=OperationAction,
+        const="exclusive",
+        metavar="TAGS",
+        help="Set the comma separated tags and remove the other tags of their"
+        " exclusive groups, see --groups",
+    )
+    parser.add_argument(
+        "--materials",
+        dest="operations",
+        action=OperationAction,
+        const="materials",
+        nargs=0,
+        help="Tag the objects with their material names",
+    )
+    parser.add_argument(
+        "--rules",
+        dest="operations",
+        action=OperationAction,
+        const="rules",
+        metavar="RULES_FILE",
+        help="Add the tags of the matching rules of a JSON rule file",
+    )
+    parser.add_argument(
+        "--export",
+        dest="operations",
+        action=OperationAction,
+        const="export",
+        metavar="SNAPSHOT",
+        help="Export the tags to a snapshot, {scene} is replaced by the scene name,"
+        " .gts files use the binary format",
+    )
+    parser.add_argument(
+        "--import",
+        dest="operations",
+        action=OperationAction,
+        const="import",
+        metavar="SNAPSHOT",
+        help="Apply the tags of a snapshot, {scene} is replaced by the scene name",
+    )
+    parser.add_argument(
+        "--lint",
+        dest="operations",
+        action=OperationAction,
+        const="lint",
+        nargs=0,
+        help="Report the dirty GuerillaTags strings in the result line",
+    )
+    parser.add_argument(
+        "--lint-fix",
+        dest="operations",
+        action=OperationAction,
+        const="lint-fix",
+        nargs=0,
+        help="Same as --lint and write the fixed strings",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=multiprocessing.cpu_count(),
+        help="Number of scenes processed at the same time",
+    )
+    parser.add_argument(
+        "--groups",
+        help="JSON config of the exclusive groups, tag_groups.json by default",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Do not save the scenes")
+    return parser.parse_args(arguments)
+
+
+def initialize_worker():
+    import maya.standalone
+
+    maya.standalone.initialize(name="python")
+    # No undo queue needed, lets the edits go through the bulk backend
+    tag_utils.cmds.undoInfo(state=False)
+
+
+def apply_operation(
+    index, objects, material_cache, operation, value, groups_path=None
+) -> int:
+    """
+    Apply one command line operation to the objects
+    :return: number of objects written
+    """
+    if operation == "add":
+        return tag_edit.add_tags(index, objects, tag_utils.convert_gtags_in_list(value))
+    if operation == "delete":
+        return tag_edit.remove_tags(
+            index, objects, tag_utils.convert_gtags_in_list(value)
+        )
+    if operation == "replace":
+        old_tags, _, new_tags = value.partition("=")
+        return tag_edit.replace_tags(
+            index,
+            objects,
+            tag_utils.convert_gtags_in_list(old_tags),
+            tag_utils.convert_gtags_in_list(new_tags),
+        )
+    if operation == "merge":
+        old_tags, _, new_tag = value.partition("=")
+        return tag_edit.merge_tags(
+            index, objects, tag_utils.convert_gtags_in_list(old_tags), new_tag.strip()
+        )
+    if operation == "subdiv":
+        return tag_edit.set_exclusive_tag(index, objects, value, tag_edit.SUBDIV_TAGS)
+    if operation == "exclusive":
+        return tag_edit.set_exclusive_tags(
+            index,
+            objects,
+            tag_utils.convert_gtags_in_list(value),
+            tag_edit.load_exclusive_groups(groups_path),
+        )
+    if operation == "materials":
+        return tag_edit.tag_materials(index, objects, material_cache)
+    if operation == "export":
+        tag_caching.export_snapshot(
+            value, index, objects, binary=value.endswith(".gts")
+        )
+        return 0
+    if operation == "import":
+        return tag_caching.import_snapshot(value, index)
+    if operation == "rules":
+        return tag_rules.apply_rules(
+            index, tag_rules.load_rules(value), objects, material_cache
+        )
+    raise ValueError(f"Unknown operation : {operation}")
+
+
+def process_scene(job: tuple) -> dict:
+    """
+    Open the scene, apply the operations and save it if anything changed
+    :param job: (path, operations, dry_run, groups_path)
+    :return: result reported as one JSON line
+    """
+    path, operations, dry_run, groups_path = job
+    start = time.perf_counter()
+    result = {"file": path, "ok": True, "operations": []}
+    try:
+        tag_utils.cmds.file(path, open=True, force=True)
+        objects = tag_caching.ObjectBlacklist().filter(
+            tag_utils.get_clean_selection("all")
+        )
+        index = tag_caching.TagIndex()
+        index.ensure(objects)
+        material_cache = tag_caching.MaterialCache()
+        changed_objects = 0
+        scene_name = os.path.splitext(os.path.basename(path))[0]
+        for operation, value in operations:
+            if value is not None:
+                value = value.replace("{scene}", scene_name)
+            operation_result = {"operation": operation, "value": value}
+            if operation in ("lint", "lint-fix"):
+                report = tag_lint.run_lint(
+                    material_cache=material_cache,
+                    fix=operation == "lint-fix",
+                    index=index,
+                )
+                operation_result["lint"] = report
+                changed = report["fixed"]
+            else:
+                changed = apply_operation(
+                    index, objects, material_cache, operation, value, groups_path
+                )
+            changed_objects += changed
+            operation_result["changed"] = changed
+            result["operations"].append(operation_result)
+        result["objects"] = len(objects)
+        result["saved"] = bool(changed_objects) and not dry_run
+        if result["saved"]:
+            tag_utils.cmds.file(save=True, force=True)
+    except Exception as error:
+        result["ok"] = False
+        result["error"] = str(error)
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def main(arguments: list = None) -> int:
+    options = parse_arguments(sys.argv[1:] if arguments is None else arguments)
+    operations = [
+        (operation, value or None) for operation, value in options.operations or []
+    ]
+    jobs = [
+        (path, operations, options.dry_run, options.groups) for path in options.files
+    ]
+    failed = 0
+    # One scene per worker process, each with its own Maya session
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        max(1, min(options.jobs, len(jobs))), initializer=initialize_worker
+    ) as pool:
+        for result in pool.imap_unordered(process_scene, jobs):
+            failed += not result["ok"]
+            sys.stdout.write(json.dumps(result) + "\n")
+            sys.stdout.flush()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
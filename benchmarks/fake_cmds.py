@@ -0,0 +1,296 @@
+import collections
+import sys
+import tempfile
+import types
+
+# In-memory stand-in for the maya.cmds calls of the editor, counting every call.
+# Node names are unique in the fake scenes, so the short name of a node is the
+# name returned by cmds.ls and the full path is built from its parents.
+
+SHAPE_TYPES = ("mesh", "nurbsCurve", "camera")
+MATERIAL_TYPES = ("lambert", "blinn", "aiStandardSurface")
+
+
+class FakeNode(object):
+    __slots__ = ("name", "type", "parent", "children", "gtags", "connections")
+
+    def __init__(self, name: str, node_type: str, parent=None):
+        self.name = name
+        self.type = node_type
+        self.parent = parent
+        self.children = []
+        # GuerillaTags attribute value, None when the attribute does not exist
+        self.gtags = None
+        self.connections = []
+
+    def long_name(self) -> str:
+        names = []
+        node = self
+        while node is not None:
+            names.append(node.name)
+            node = node.parent
+        return "|" + "|".join(reversed(names))
+
+
+class FakeScene(object):
+    """
+    Nodes, selection and shading assignments answered by the fake maya.cmds
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.selection = []
+        # shadingEngine -> member shapes
+        self.set_members = {}
+        self.calls = collections.Counter()
+        # Path answered by cmds.file, untitled scene when empty
+        self.path = ""
+        self.modified = False
+
+    def add_node(self, name: str, node_type: str, parent: str = None) -> FakeNode:
+        parent_node = self.nodes[parent] if parent else None
+        node = FakeNode(name, node_type, parent_node)
+        if parent_node is not None:
+            parent_node.children.append(node)
+        self.nodes[name] = node
+        return node
+
+    def connect(self, source: str, destination: str) -> None:
+        self.nodes[source].connections.append(destination)
+        self.nodes[destination].connections.append(source)
+
+    def assign_material(self, shading_engine: str, shapes: list) -> None:
+        self.set_members.setdefault(shading_engine, []).extend(shapes)
+        for shape in shapes:
+            self.nodes[shape].connections.append(shading_engine)
+
+    def get_node(self, name: str):
+        return self.nodes.get(name.rpartition("|")[2].partition(".")[0])
+
+    def reset_calls(self) -> None:
+        self.calls.clear()
+
+
+_scene = FakeScene()
+
+
+def get_scene() -> FakeScene:
+    return _scene
+
+
+def set_scene(scene: FakeScene) -> None:
+    """
+    Make the fake maya.cmds answer from the scene
+    :param scene:
+    :return:
+    """
+    global _scene
+    _scene = scene
+
+
+def install() -> types.ModuleType:
+    """
+    Register the fake maya and maya.cmds modules, must run before tag_utils is
+    imported. maya.api stays missing so the tools fall back on maya.cmds.
+    :return: the fake maya.cmds module
+    """
+    maya_module = types.ModuleType("maya")
+    cmds_module = types.ModuleType("maya.cmds")
+    for name, function in _COMMANDS.items():
+        setattr(cmds_module, name, _counted(name, function))
+    maya_module.cmds = cmds_module
+    sys.modules["maya"] = maya_module
+    sys.modules["maya.cmds"] = cmds_module
+    return cmds_module
+
+
+def _counted(name: str, function):
+    def command(*args, **kwargs):
+        _scene.calls[name] += 1
+        return function(*args, **kwargs)
+
+    command.__name__ = name
+    return command
+
+
+def _flatten(args) -> list:
+    names = []
+    for arg in args:
+        if isinstance(arg, str):
+            names.append(arg)
+        else:
+            names.extend(arg)
+    return names
+
+
+def _resolve(args) -> list:
+    nodes = []
+    for name in _flatten(args):
+        node = _scene.get_node(name)
+        if node is not None:
+            nodes.append(node)
+    return nodes
+
+
+def _name(node: FakeNode, long_name: bool) -> str:
+    return node.long_name() if long_name else node.name
+
+
+# Commands
+
+
+def ls(*args, **kwargs):
+    if args:
+        nodes = _resolve(args)
+    elif kwargs.get("selection") or kwargs.get("sl"):
+        nodes = _resolve(_scene.selection)
+    else:
+        nodes = list(_scene.nodes.values())
+    if kwargs.get("tr") or kwargs.get("transforms"):
+        nodes = [node for node in nodes if node.type == "transform"]
+    if kwargs.get("shapes"):
+        nodes = [node for node in nodes if node.type in SHAPE_TYPES]
+    if kwargs.get("cameras"):
+        nodes = [node for node in nodes if node.type == "camera"]
+    if kwargs.get("materials"):
+        nodes = [node for node in nodes if node.type in MATERIAL_TYPES]
+    if "type" in kwargs:
+        nodes = [node for node in nodes if node.type == kwargs["type"]]
+    long_name = kwargs.get("long", False)
+    if kwargs.get("showType"):
+        result = []
+        for node in nodes:
+            result.extend((_name(node, long_name), node.type))
+        return result
+    return [_name(node, long_name) for node in nodes]
+
+
+def listRelatives(*args, **kwargs):
+    nodes = _resolve(args)
+    long_name = kwargs.get("fullPath", False)
+    relatives = []
+    if kwargs.get("parent"):
+        relatives = [node.parent for node in nodes if node.parent is not None]
+    elif kwargs.get("allDescendents") or kwargs.get("ad"):
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            relatives.extend(node.children)
+            stack.extend(node.children)
+    else:
+        for node in nodes:
+            relatives.extend(node.children)
+    if kwargs.get("shapes"):
+        relatives = [node for node in relatives if node.type in SHAPE_TYPES]
+    if "type" in kwargs:
+        relatives = [node for node in relatives if node.type == kwargs["type"]]
+    # Maya returns None instead of an empty list
+    return [_name(node, long_name) for node in relatives] or None
+
+
+def nodeType(name):
+    node = _scene.get_node(name)
+    if node is None:
+        raise RuntimeError(f"No object matches name: {name}")
+    return node.type
+
+
+def attributeQuery(attribute, node=None, exists=False):
+    fake_node = _scene.get_node(node)
+    if fake_node is None:
+        raise RuntimeError(f"No object matches name: {node}")
+    return attribute == "GuerillaTags" and fake_node.gtags is not None
+
+
+def getAttr(plug):
+    node = _scene.get_node(plug)
+    if node is None or node.gtags is None:
+        raise ValueError(f"No object matches name: {plug}")
+    return node.gtags
+
+
+def setAttr(plug, value, **kwargs):
+    node = _scene.get_node(plug)
+    if node is None or node.gtags is None:
+        raise RuntimeError(f"No object matches name: {plug}")
+    node.gtags = value
+
+
+def addAttr(name, longName=None, dataType=None, **kwargs):
+    node = _scene.get_node(name)
+    if node is None:
+        raise RuntimeError(f"No object matches name: {name}")
+    if node.gtags is not None:
+        raise RuntimeError(f"Found more than one attribute named {longName}")
+    node.gtags = ""
+
+
+def listConnections(*args, **kwargs):
+    connections = []
+    for node in _resolve(args):
+        connections.extend(node.connections)
+    return connections or None
+
+
+def listHistory(*args, **kwargs):
+    history = []
+    for node in _resolve(args):
+        history.append(node.name)
+        history.extend(child.name for child in node.children if child.type == "mesh")
+    return history
+
+
+def sets(name, query=False, **kwargs):
+    return list(_scene.set_members.get(name, [])) or None
+
+
+def select(*args, **kwargs):
+    if kwargs.get("clear"):
+        _scene.selection = []
+        return
+    names = [node.name for node in _resolve(args)]
+    if kwargs.get("add"):
+        _scene.selection.extend(names)
+    else:
+        _scene.selection = names
+
+
+def polyEvaluate(name, face=False):
+    return 500
+
+
+def undoInfo(**kwargs):
+    if kwargs.get("query") and kwargs.get("state"):
+        return True
+
+
+def file(*args, **kwargs):
+    if kwargs.get("sceneName"):
+        return _scene.path
+    if kwargs.get("reference"):
+        return []
+    if kwargs.get("modified"):
+        return _scene.modified
+
+
+def internalVar(**kwargs):
+    return tempfile.gettempdir()
+
+
+_COMMANDS = {
+    "ls": ls,
+    "listRelatives": listRelatives,
+    "nodeType": nodeType,
+    "attributeQuery": attributeQuery,
+    "getAttr": getAttr,
+    "setAttr": setAttr,
+    "addAttr": addAttr,
+    "listConnections": listConnections,
+    "listHistory": listHistory,
+    "sets": sets,
+    "select": select,
+    "polyEvaluate": polyEvaluate,
+    "undoInfo": undoInfo,
+    "file": file,
+    "internalVar": internalVar,
+}
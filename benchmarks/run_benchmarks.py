@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fake_cmds
+
+# The fake maya.cmds must be registered before the tools import it
+fake_cmds.install()
+
+import scenes
+import tag_utils
+import tag_caching
+import tag_edit
+import tag_query
+
+# Time the editor operations on synthetic scenes and count their maya.cmds calls :
+# python benchmarks/run_benchmarks.py --sizes 1000 10000 --json results.json
+
+SELECTION_RATIO = 0.1
+# Saved scene path of the disk cache benchmark, the file does not exist so the
+# cache is checked against the scene as after the scene was saved elsewhere
+CACHED_SCENE_PATH = "bench_scene.ma"
+
+_cache_directory = tempfile.TemporaryDirectory(prefix="gtags_benchmarks")
+
+
+# Every benchmark prepares its state from the scene and returns the timed callable
+
+
+def bench_clean_selection_all(scene):
+    return lambda: tag_utils.get_clean_selection("all")
+
+
+def bench_clean_selection_children(scene):
+    groups = scenes.get_top_groups(scene)
+    scene.selection = groups[: max(1, int(len(groups) * SELECTION_RATIO))]
+    return lambda: tag_utils.get_clean_selection("children")
+
+
+def bench_refresh_cold(scene):
+    index, selection_tags, object_blacklist = _new_editor_state()
+    scene.selection = _select_leaves(scene, 0)
+    return _refresh(selection_tags, object_blacklist, "selection")
+
+
+def bench_refresh_warm(scene):
+    index, selection_tags, object_blacklist = _new_editor_state()
+    scene.selection = _select_leaves(scene, 0)
+    _refresh(selection_tags, object_blacklist, "selection")()
+    # Half of the new selection was already selected
+    scene.selection = _select_leaves(scene, 0.5)
+    return _refresh(selection_tags, object_blacklist, "selection")
+
+
+def bench_refresh_scene_mode(scene):
+    index, selection_tags, object_blacklist = _new_editor_state()
+    return _refresh(selection_tags, object_blacklist, "all")
+
+
+def bench_refresh_scene_mode_cached(scene):
+    scene.path = CACHED_SCENE_PATH
+    disk_cache = tag_caching.DiskCache(_cache_directory.name)
+    index = tag_caching.TagIndex()
+    index.ensure(tag_utils.get_clean_selection("all"))
+    disk_cache.save(scene.path, index)
+    index, selection_tags, object_blacklist = _new_editor_state()
+    refresh = _refresh(selection_tags, object_blacklist, "all")
+
+    def refresh_from_cache():
+        # Same work as guerillaTagsEditor.load_disk_cache, verification included
+        objects, unverified_objects = tag_caching.load_scene_cache(
+            disk_cache, index, scene.path
+        )
+        for _ in tag_caching.verify_objects(index, unverified_objects):
+            pass
+        return refresh()
+
+    return refresh_from_cache
+
+
+def bench_add_gtags(scene):
+    index, selection_tags, object_blacklist = _new_editor_state()
+    scene.selection = _select_leaves(scene, 0)
+    _refresh(selection_tags, object_blacklist, "selection")()
+    selection = tag_caching.get_affected_objects("selection", object_blacklist)
+    return lambda: tag_edit.add_tags(index, selection, ["bench", "smooth"])
+
+
+def bench_merge_all(scene):
+    index, selection_tags, object_blacklist = _new_editor_state()
+    scene.selection = _select_leaves(scene, 0)
+    _refresh(selection_tags, object_blacklist, "selection")()
+    selection = tag_caching.get_affected_objects("selection", object_blacklist)
+    return lambda: tag_edit.add_tags(index, selection, selection_tags.get_tags())
+
+
+def bench_drop(scene):
+    groups = scenes.get_top_groups(scene)
+    dropped = groups[: max(1, int(len(groups) * SELECTION_RATIO))]
+    index, selection_tags, object_blacklist = _new_editor_state()
+    return lambda: tag_caching.get_dropped_tags(
+        index, dropped, "children", object_blacklist
+    )
+
+
+def bench_tag_materials(scene):
+    index = tag_caching.TagIndex()
+    scene.selection = _select_leaves(scene, 0)
+    selection = tag_utils.get_clean_selection("selection")
+    index.ensure(selection)
+    return lambda: tag_edit.tag_materials(index, selection, tag_caching.MaterialCache())
+
+
+def bench_rename_in_scene(scene):
+    index = tag_caching.TagIndex()
+    objects = tag_utils.get_clean_selection("all")
+    index.ensure(objects)
+    return lambda: tag_edit.merge_tags(index, objects, ["tag005", "tag006"], "merged")
+
+
+def bench_select_query(scene):
+    index = tag_caching.TagIndex()
+    objects = tag_utils.get_clean_selection("all")
+    index.ensure(objects)
+    query = tag_query.TagQuery("(smooth | tag00*) & s02 & !tag001")
+
+    def select_query():
+        mask = query.get_mask(index, index.get_mask(objects))
+        tag_utils.select_objects(index.get_objects_from_mask(mask))
+
+    return select_query
+
+
+BENCHMARKS = {
+    "get_clean_selection all": bench_clean_selection_all,
+    "get_clean_selection children": bench_clean_selection_children,
+    "refresh selection cold": bench_refresh_cold,
+    "refresh selection warm": bench_refresh_warm,
+    "refresh scene mode": bench_refresh_scene_mode,
+    "refresh scene mode disk cache": bench_refresh_scene_mode_cached,
+    "add_gtags": bench_add_gtags,
+    "merge_all": bench_merge_all,
+    "drop": bench_drop,
+    "tag_materials": bench_tag_materials,
+    "rename in scene": bench_rename_in_scene,
+    "select query": bench_select_query,
+}
+
+
+def _new_editor_state() -> tuple:
+    index = tag_caching.TagIndex()
+    return index, tag_caching.SelectionTags(index), tag_caching.ObjectBlacklist()
+
+
+def _refresh(selection_tags, object_blacklist, mode):
+    """
+    Same work as guerillaTagsEditor.refresh_tag_list_widget, without the model.
+    The Scene mode scan run by the editor from the idle loop is timed until the
+    whole scene is read.
+    """
+
+    def refresh():
+        missing_objects = tag_caching.refresh_selection_tags(
+            selection_tags,
+            tag_caching.get_affected_objects(mode, object_blacklist),
+            progressive=mode == "all",
+        )
+        for _ in tag_caching.scan_selection_tags(selection_tags, missing_objects):
+            pass
+        return selection_tags.get_tags(), selection_tags.get_shared_tags()
+
+    return refresh
+
+
+def _select_leaves(scene, offset: float) -> list:
+    leaves = scenes.get_leaves(scene)
+    count = max(1, int(len(leaves) * SELECTION_RATIO))
+    start = int(count * offset)
+    return leaves[start : start + count]
+
+
+def run_benchmark(scene, benchmark, repeat: int) -> dict:
+    """
+    Run the benchmark on a fresh copy of the scene state, keeping the best time
+    :param scene:
+    :param benchmark:
+    :param repeat:
+    :return: {"seconds": best wall time, "calls": {command: count}}
+    """
+    gtags = {name: node.gtags for name, node in scene.nodes.items()}
+    best_time = None
+    calls = {}
+    for _ in range(repeat):
+        for name, value in gtags.items():
+            scene.nodes[name].gtags = value
+        scene.selection = []
+        scene.path = ""
+        operation = benchmark(scene)
+        scene.reset_calls()
+        start = time.perf_counter()
+        operation()
+        duration = time.perf_counter() - start
+        if best_time is None or duration < best_time:
+            best_time = duration
+        calls = dict(scene.calls)
+    for name, value in gtags.items():
+        scene.nodes[name].gtags = value
+    scene.path = ""
+    return {"seconds": best_time, "calls": calls}
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> str:
+    """
+    Describe the difference with the baseline result, flagged when it regressed
+    :param result:
+    :param baseline:
+    :param tolerance: slowdown ratio allowed before flagging the time
+    :return:
+    """
+    ratio = result["seconds"] / max(baseline["seconds"], 1e-9)
+    call_delta = sum(result["calls"].values()) - sum(baseline["calls"].values())
+    regressed = ratio > tolerance or call_delta > 0
+    return f"x{ratio:.2f} {call_delta:+d} calls" + (" REGRESSION" if regressed else "")
+
+
+def parse_arguments(arguments: list):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the tag operations on synthetic scenes"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of transforms of the generated scenes, up to 1000000",
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        choices=list(BENCHMARKS),
+        default=list(BENCHMARKS),
+        metavar="OPERATION",
+        help="Benchmarks to run, all by default",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Scene generator seed")
+    parser.add_argument("--json", help="Write the results to a JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.25,
+        help="Slowdown ratio flagged as a regression when comparing",
+    )
+    return parser.parse_args(arguments)
+
+
+def main(arguments: list = None) -> int:
+    options = parse_arguments(sys.argv[1:] if arguments is None else arguments)
+    baseline = {}
+    if options.baseline:
+        with open(options.baseline, "r") as f:
+            for result in json.load(f):
+                baseline[(result["size"], result["operation"])] = result
+    results = []
+    regressions = 0
+    for size in options.sizes:
+        start = time.perf_counter()
+        scene = scenes.generate_scene(size, options.seed)
+        fake_cmds.set_scene(scene)
+        print(
+            f"\n{size} transforms, {len(scene.nodes)} nodes"
+            f" (generated in {time.perf_counter() - start:.1f} s)"
+        )
+        for operation in options.operations:
+            result = run_benchmark(scene, BENCHMARKS[operation], options.repeat)
+            result.update(size=size, operation=operation)
+            results.append(result)
+            top_calls = sorted(result["calls"].items(), key=lambda item: -item[1])
+            line = (
+                f"  {operation:<30} {result['seconds'] * 1000:>10.1f} ms"
+                f" {sum(result['calls'].values()):>9} calls  "
+                + " ".join(f"{command}={count}" for command, count in top_calls[:4])
+            )
+            if (size, operation) in baseline:
+                comparison = compare(
+                    result, baseline[(size, operation)], options.tolerance
+                )
+                regressions += comparison.endswith("REGRESSION")
+                line += f"  [{comparison}]"
+            print(line)
+    if options.json:
+        with open(options.json, "w") as f:
+            json.dump(results, f, indent=1)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import random
+
+import fake_cmds
+
+# Synthetic scenes shaped like a set dressing scene : assets made of a top group,
+# a few sub groups and mesh leaves, sharing materials and carrying tags picked
+# with the frequencies seen in production files.
+
+ASSET_SIZE = 50
+SUBGROUPS_PER_ASSET = 4
+LEAVES_PER_MATERIAL = 40
+CAMERA_COUNT = 4
+SUBDIV_TAGS = ["s0", "s01", "s02", "s03", "s04"]
+# A few descriptive tags are everywhere, most of them are rare
+VOCABULARY = [f"tag{i:03d}" for i in range(200)]
+VOCABULARY_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+# Share of the leaves without the attribute, and with an empty attribute
+UNTAGGED_RATIO = 0.25
+EMPTY_RATIO = 0.05
+SMOOTH_RATIO = 0.3
+SUBDIV_RATIO = 0.4
+
+
+def generate_scene(transform_count: int, seed: int = 0) -> fake_cmds.FakeScene:
+    """
+    Build a scene of about transform_count transforms, the same for a given seed
+    :param transform_count:
+    :param seed:
+    :return:
+    """
+    generator = random.Random(seed)
+    scene = fake_cmds.FakeScene()
+    for camera in range(CAMERA_COUNT):
+        scene.add_node(f"camera{camera}", "transform")
+        scene.add_node(f"camera{camera}Shape", "camera", f"camera{camera}")
+    scene.add_node("lambert1", "lambert")
+    scene.add_node("initialShadingGroup", "shadingEngine")
+    scene.connect("lambert1", "initialShadingGroup")
+
+    asset_count = max(1, (transform_count - CAMERA_COUNT) // ASSET_SIZE)
+    leaf_count = 0
+    material_members = []
+    for asset in range(asset_count):
+        asset_group = f"asset{asset}_grp"
+        asset_tag = f"asset{asset % 500:03d}"
+        scene.add_node(asset_group, "transform")
+        subgroups = []
+        for subgroup in range(SUBGROUPS_PER_ASSET):
+            subgroups.append(f"asset{asset}_part{subgroup}_grp")
+            scene.add_node(subgroups[-1], "transform", asset_group)
+        for leaf in range(ASSET_SIZE - SUBGROUPS_PER_ASSET - 1):
+            name = f"asset{asset}_geo{leaf}"
+            scene.add_node(name, "transform", generator.choice(subgroups))
+            scene.add_node(f"{name}Shape", "mesh", name)
+            scene.nodes[name].gtags = _random_gtags(generator, asset_tag)
+            material_members.append(f"{name}Shape")
+            leaf_count += 1
+            if len(material_members) == LEAVES_PER_MATERIAL:
+                _add_material(scene, len(scene.set_members), material_members)
+                material_members = []
+    if material_members:
+        _add_material(scene, len(scene.set_members), material_members)
+    return scene
+
+
+def get_top_groups(scene: fake_cmds.FakeScene) -> list:
+    """
+    Get the asset groups of a generated scene
+    :param scene:
+    :return:
+    """
+    return [
+        node.name
+        for node in scene.nodes.values()
+        if node.type == "transform"
+        and node.parent is None
+        and node.children
+        and not node.name.startswith("camera")
+    ]
+
+
+def get_leaves(scene: fake_cmds.FakeScene) -> list:
+    """
+    Get the mesh transforms of a generated scene
+    :param scene:
+    :return:
+    """
+    return [
+        node.parent.name
+        for node in scene.nodes.values()
+        if node.type == "mesh" and node.parent is not None
+    ]
+
+
+def _random_gtags(generator: random.Random, asset_tag: str):
+    draw = generator.random()
+    if draw < UNTAGGED_RATIO:
+        return None
+    if draw < UNTAGGED_RATIO + EMPTY_RATIO:
+        return ""
+    tags = [asset_tag]
+    if generator.random() < SMOOTH_RATIO:
+        tags.append("smooth")
+    if generator.random() < SUBDIV_RATIO:
+        tags.append(generator.choice(SUBDIV_TAGS))
+    tags.extend(
+        generator.choices(VOCABULARY, VOCABULARY_WEIGHTS, k=generator.randint(0, 3))
+    )
+    return ", ".join(dict.fromkeys(tags))
+
+
+def _add_material(scene: fake_cmds.FakeScene, number: int, shapes: list) -> None:
+    material = f"material{number}"
+    shading_engine = f"material{number}SG"
+    scene.add_node(material, "blinn")
+    scene.add_node(shading_engine, "shadingEngine")
+    scene.connect(material, shading_engine)
+    scene.assign_material(shading_engine, shapes)
@@ -2,62 +2,205 @@ from PySide2 import QtWidgets, QtGui, QtCore
 from shiboken2 import wrapInstance
 import path_utils
 import tag_utils
+import tag_caching
+import tag_edit
+import tag_callbacks
+import tag_rules
+import tag_profiling
+import tag_query
+import tag_lint
 
 import maya.utils
 import maya.cmds as cmds
 import maya.OpenMayaUI as omui
-import importlib
 
+import contextlib
 import logging
+import sys
+import time
 
-# Logging setup
+# Logging setup, the handler is installed once even if the module is reloaded
 logger = logging.getLogger(__name__)
-hdlr = maya.utils.MayaGuiLogHandler()
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-hdlr.setFormatter(formatter)
-logger.addHandler(hdlr)
+if not logger.handlers:
+    hdlr = maya.utils.MayaGuiLogHandler()
+    formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
+    hdlr.setFormatter(formatter)
+    logger.addHandler(hdlr)
 logger.setLevel(logging.INFO)
 logger.propagate = False
 
-logger.info("Logger testing")
+_stylesheet = None
 
-for modules in [tag_utils, path_utils]:
-    importlib.reload(modules)
+GROUP_BUTTON_COLUMNS = 2
+# Number of dirty objects detailed in the log by the lint
+LINT_LOG_LIMIT = 50
 
 
 # UI related stuff
+def get_stylesheet() -> str:
+    """
+    Read the stylesheet once per Maya session
+    :return:
+    """
+    global _stylesheet
+    if _stylesheet is None:
+        with open(path_utils.get_abspath("icons/stylesheet.css"), "r") as f:
+            _stylesheet = f.read()
+    return _stylesheet
+
+
 def maya_main_window():
     main_window_ptr = omui.MQtUtil.mainWindow()
     return wrapInstance(int(main_window_ptr), QtWidgets.QWidget)
 
 
+class TagListModel(QtCore.QAbstractListModel):
+    """
+    Tags of the selection, updated with row inserts and removes computed from the
+    previous tags so the view keeps its selection. Coverage and icons are read
+    lazily from the SelectionTags counts when the view asks for them.
+    """
+
+    def __init__(self, selection_tags, shared_tag_icon, parent=None):
+        super(TagListModel, self).__init__(parent)
+        self.selection_tags = selection_tags
+        self.shared_tag_icon = shared_tag_icon
+        self.highlight_shared = True
+        self.tags = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.tags)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        tag = self.tags[index.row()]
+        if role == QtCore.Qt.UserRole:
+            return tag
+        if role == QtCore.Qt.SizeHintRole:
+            return QtCore.QSize(20, 30)
+        selection_count = len(self.selection_tags.objects)
+        count = self.selection_tags.get_coverage(tag)
+        if role == QtCore.Qt.DisplayRole:
+            if selection_count > 1:
+                return f"{tag} \u2014 {count}/{selection_count}"
+            return tag
+        if role == QtCore.Qt.ToolTipRole:
+            return f"{count} of {selection_count} objects carry {tag}"
+        if role == QtCore.Qt.DecorationRole:
+            if self.highlight_shared and 1 < selection_count == count:
+                return self.shared_tag_icon
+        return None
+
+    def set_tags(self, tags: list) -> None:
+        """
+        Remove the rows of the tags that are gone and append the new tags
+        :param tags:
+        :return:
+        """
+        new_tag_set = set(tags)
+        # Remove the contiguous blocks from the end so the row numbers stay valid
+        last_row = len(self.tags) - 1
+        while last_row >= 0:
+            if self.tags[last_row] in new_tag_set:
+                last_row -= 1
+                continue
+            first_row = last_row
+            while first_row > 0 and self.tags[first_row - 1] not in new_tag_set:
+                first_row -= 1
+            self.beginRemoveRows(QtCore.QModelIndex(), first_row, last_row)
+            del self.tags[first_row : last_row + 1]
+            self.endRemoveRows()
+            last_row = first_row - 1
+        old_tag_set = set(self.tags)
+        added_tags = [tag for tag in tags if tag not in old_tag_set]
+        if added_tags:
+            first_row = len(self.tags)
+            self.beginInsertRows(
+                QtCore.QModelIndex(), first_row, first_row + len(added_tags) - 1
+            )
+            self.tags.extend(added_tags)
+            self.endInsertRows()
+        self.refresh_data()
+
+    def refresh_data(self) -> None:
+        """
+        Ask the views to read again the coverage and icons of the rows
+        :return:
+        """
+        if self.tags:
+            self.dataChanged.emit(self.index(0), self.index(len(self.tags) - 1))
+
+
 class guerillaTagsEditor(QtWidgets.QDialog):
-    def __init__(self, parent=maya_main_window()):
+    def __init__(self, parent=None):
+        init_start = time.perf_counter()
+        if parent is None:
+            parent = maya_main_window()
         super(guerillaTagsEditor, self).__init__(parent)
-        icons_dir = path_utils.get_abspath("icons")
-        QtCore.QDir.addSearchPath("images", icons_dir)
-        with open(path_utils.get_abspath("icons/stylesheet.css"), "r") as f:
-            stylesheet = f.read()
-        self.setStyleSheet(stylesheet)
-        self.scene_cache = {}
-        self.is_scene_cached = False
+        # Duration of the startup phases, logged after the first refresh
+        self.startup_timings = {}
+        with self.timed_phase("stylesheet"):
+            icons_dir = path_utils.get_abspath("icons")
+            QtCore.QDir.addSearchPath("images", icons_dir)
+            self.setStyleSheet(get_stylesheet())
+        # Two-way tag index shared by every action of the editor
+        self.scene_cache = tag_caching.TagIndex()
+        self.selection_tags = tag_caching.SelectionTags(self.scene_cache)
+        # Member -> materials map, resolved when materials are first tagged
+        self.material_cache = tag_caching.MaterialCache()
         # Objects we do not want to affect such as camera transform
-        self.object_blacklist = []
-        self.import_icons()
-        self.create_widgets()
-        self.create_layout()
+        self.object_blacklist = tag_caching.ObjectBlacklist()
+        # Scene cache saved on disk between two sessions of the editor
+        self.disk_cache = tag_caching.DiskCache()
+        self.disk_cache_scene = None
+        self.verification = None
+        # Exclusive tag groups, a button is created for each of their tags
+        self.exclusive_groups = tag_edit.load_exclusive_groups()
+        # Progressive read of the scene in Scene mode, not restarted once
+        # cancelled until the mode is changed
+        self.scan = None
+        self.scan_cancelled = False
+        # Called once the running scan read every object, e.g. a query waiting
+        # for the whole scene
+        self.scan_finished = None
+        with self.timed_phase("widgets"):
+            self.import_icons()
+            self.create_widgets()
+            self.create_layout()
         self.affect_mode = "selection"
-        self.generate_selection_scriptjob()
+        self.script_job = None
+        self.save_script_job = None
+        # Keep the scene cache coherent with the edits made outside the editor
+        self.scene_watcher = tag_callbacks.SceneWatcher(
+            self.scene_cache,
+            self.selection_timer.start,
+            self.material_cache,
+            self.object_blacklist,
+        )
         self.setWindowIcon(
             QtGui.QIcon(path_utils.get_abspath("icons/guerilla_render.png"))
         )
         self.setWindowTitle("Guerilla Tags editor")
         self.setAcceptDrops(True)
-        self.materials_taglist = []
         self.obj_list = None
-        self.subdiv_taglist = ["s0", "s01", "s02", "s03", "s04"]
-        self.init_materials_taglist()
-        self.refresh_tag_list_widget()
+        # The scene is only read once the window is shown
+        self.startup_timings["init"] = time.perf_counter() - init_start
+
+    @contextlib.contextmanager
+    def timed_phase(self, phase: str):
+        """
+        Record the duration of a startup phase
+        :param phase:
+        :return:
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_timings[phase] = time.perf_counter() - start
 
     def create_widgets(self):
         """
@@ -65,12 +208,28 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         """
         self.label_title = QtWidgets.QLabel("Tags on selection")
 
-        self.tag_list = QtWidgets.QListWidget()
+        self.tag_model = TagListModel(self.selection_tags, self.shared_tag_icon, self)
+        self.tag_list = QtWidgets.QListView()
+        self.tag_list.setModel(self.tag_model)
         self.tag_list.setToolTip("Tags present on the selection")
         self.tag_list.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.tag_list.setSizePolicy(
             QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding
         )
+        self.tag_list.doubleClicked.connect(self.select_tag_objects)
+
+        self.query_input = QtWidgets.QLineEdit()
+        self.query_input.setFixedHeight(24)
+        self.query_input.setPlaceholderText("Select by tags : smooth & s02 & !proxy*")
+        self.query_input.setToolTip(
+            "Select the scene objects matching the query, tags can be combined with"
+            " & (and), | (or), ! (not), parentheses and the wildcards * and ?"
+        )
+        self.query_input.returnPressed.connect(self.select_query)
+
+        self.query_button = QtWidgets.QPushButton("Select")
+        self.query_button.setToolTip("Select the scene objects matching the query")
+        self.query_button.clicked.connect(self.select_query)
 
         self.tag_input = QtWidgets.QLineEdit()
         self.tag_input.setFixedHeight(24)
@@ -114,6 +273,17 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.highlight_shared_tags.setChecked(True)
         self.highlight_shared_tags.clicked.connect(self.refresh_tag_list_widget)
 
+        self.sort_dropped_check = QtWidgets.QCheckBox("Sort dropped tags by frequency")
+        self.sort_dropped_check.setToolTip(
+            "Order the tags of the dropped objects from the most to the least carried"
+        )
+
+        self.select_partial_button = QtWidgets.QPushButton("Select partial tags")
+        self.select_partial_button.setToolTip(
+            "Select the tags carried by only a part of the selection"
+        )
+        self.select_partial_button.clicked.connect(self.select_partial_tags)
+
         self.selection_label = QtWidgets.QLabel("Tag mode")
 
         self.get_children_check = QtWidgets.QCheckBox("Selection children")
@@ -135,34 +305,91 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.tag_materials.clicked.connect(self.add_tag_materials)
         self.tag_materials.setToolTip("Set the material name to the object")
 
+        self.apply_rules_button = QtWidgets.QPushButton("Apply rules")
+        self.apply_rules_button.clicked.connect(self.apply_tag_rules)
+        self.apply_rules_button.setToolTip(
+            "Add the tags of the rules of a JSON rule file to the matching objects"
+        )
+
+        self.merge_in_scene_button = QtWidgets.QPushButton("Rename in scene")
+        self.merge_in_scene_button.clicked.connect(self.merge_tags_in_scene)
+        self.merge_in_scene_button.setToolTip(
+            "Rename the tags selected in the list to the tag in the line edit on"
+            " every object of the scene, several selected tags are merged"
+        )
+
+        self.lint_button = QtWidgets.QPushButton("Lint tags")
+        self.lint_button.clicked.connect(self.lint_tags)
+        self.lint_button.setToolTip(
+            "Check the tags of the scene for duplicates, empty entries, bad"
+            " separators, stale material tags and tagged cameras, and fix them"
+        )
+
+        self.export_tags_button = QtWidgets.QPushButton("Export tags")
+        self.export_tags_button.clicked.connect(self.export_tags)
+        self.export_tags_button.setToolTip(
+            "Save the tags of the objects to a snapshot file"
+        )
+
+        self.import_tags_button = QtWidgets.QPushButton("Import tags")
+        self.import_tags_button.clicked.connect(self.import_tags)
+        self.import_tags_button.setToolTip(
+            "Apply the tags of a snapshot file to the objects of the scene"
+        )
+
+        self.profile_check = QtWidgets.QCheckBox("Profile Maya calls")
+        self.profile_check.setToolTip(
+            "Show and log the time and Maya calls of the last editor action"
+        )
+        self.profile_check.toggled.connect(self.set_profiling)
+
+        self.profile_label = QtWidgets.QLabel()
+        self.profile_label.setWordWrap(True)
+        self.profile_label.setTextInteractionFlags(QtCore.Qt.TextSelectableByMouse)
+        self.profile_label.setVisible(False)
+
         self.option_label = QtWidgets.QLabel("Options")
 
+        # Coalesce the SelectionChanged events in one refresh per idle tick
+        self.selection_timer = QtCore.QTimer(self)
+        self.selection_timer.setSingleShot(True)
+        self.selection_timer.setInterval(0)
+        self.selection_timer.timeout.connect(self.refresh_on_selection_changed)
+
+        # Checks the tags loaded from the disk cache against the scene at idle time
+        self.verification_timer = QtCore.QTimer(self)
+        self.verification_timer.setInterval(0)
+        self.verification_timer.timeout.connect(self.continue_verification)
+
+        # Reads the scene a slice at a time in Scene mode
+        self.scan_timer = QtCore.QTimer(self)
+        self.scan_timer.setInterval(0)
+        self.scan_timer.timeout.connect(self.continue_scan)
+
+        self.scan_progress = QtWidgets.QProgressBar()
+        self.scan_progress.setFormat("Reading scene tags %v / %m")
+        self.scan_progress.setVisible(False)
+
+        self.cancel_scan_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_scan_button.setToolTip("Stop reading the scene tags")
+        self.cancel_scan_button.clicked.connect(self.cancel_scan_from_user)
+        self.cancel_scan_button.setVisible(False)
+
     def then_refresh(method):
         """
-        Decorator that is used to update the the instance blacklist, use methode and then refresh the instance
+        Decorator that is used to run the method and then refresh the instance
         """
 
         def instance_wrapper(self, *args):
-            wrapped_method = method(self, *args)
-            self.refresh_tag_list_widget()
+            with tag_profiling.get_profiler().action(method.__name__):
+                # Every edit of the action is undone at once
+                with tag_utils.undo_chunk(method.__name__):
+                    wrapped_method = method(self, *args)
+                self.refresh_tag_list_widget()
             return wrapped_method
 
         return instance_wrapper
 
-    def update_blacklist(self):
-        logger.info(f"Updating blacklist : {self.object_blacklist} ")
-        for obj in tag_utils.get_cameras_transform_in_scene():
-            if obj not in self.object_blacklist:
-                self.object_blacklist.append(obj)
-
-    def init_materials_taglist(self):
-        for shading_engine in cmds.ls(type="shadingEngine"):
-            if cmds.sets(shading_engine, query=True):
-                for materials in cmds.ls(
-                    cmds.listConnections(shading_engine), materials=True
-                ):
-                    self.materials_taglist.append(materials)
-
     def import_icons(self):
         self.shared_tag_icon = QtGui.QIcon(path_utils.get_abspath("icons/star.png"))
 
@@ -178,57 +405,42 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.main_layout.addLayout(self.tags_layout, 0)
         self.tag_list_layout.addWidget(self.label_title, 0)
         self.tag_list_layout.addWidget(self.tag_list, 1)
+        self.scan_layout = QtWidgets.QHBoxLayout()
+        self.scan_layout.addWidget(self.scan_progress, 1)
+        self.scan_layout.addWidget(self.cancel_scan_button, 0)
+        self.tag_list_layout.addLayout(self.scan_layout)
         self.main_layout.addWidget(self.tag_input, 1)
+        self.query_layout = QtWidgets.QHBoxLayout()
+        self.query_layout.addWidget(self.query_input, 1)
+        self.query_layout.addWidget(self.query_button, 0)
+        self.main_layout.addLayout(self.query_layout)
 
         self.tags_buttons_layout = QtWidgets.QVBoxLayout()
         self.tags_layout.addLayout(self.tags_buttons_layout, 1)
-        self.subdivsion_tag_label = QtWidgets.QLabel("Subdivision Tags")
-        self.tags_buttons_layout.addWidget(self.subdivsion_tag_label, 0)
-
-        self.s0_buton = QtWidgets.QPushButton("Tag s0")
-        self.s0_buton.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-        )
-        self.s0_buton.clicked.connect(
-            lambda state: self.tag_subdiv(self.subdiv_taglist[0])
-        )
-        self.tags_buttons_layout.addWidget(self.s0_buton, 1)
-
-        self.s01_buton = QtWidgets.QPushButton("Tag s01")
-        self.s01_buton.clicked.connect(
-            lambda state: self.tag_subdiv(self.subdiv_taglist[1])
-        )
-        self.s01_buton.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-        )
-        self.tags_buttons_layout.addWidget(self.s01_buton, 2)
-
-        self.s02_buton = QtWidgets.QPushButton("Tag s02")
-        self.s02_buton.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-        )
-        self.s02_buton.clicked.connect(
-            lambda state: self.tag_subdiv(self.subdiv_taglist[2])
-        )
-        self.tags_buttons_layout.addWidget(self.s02_buton, 3)
-
-        self.s03_buton = QtWidgets.QPushButton("Tag s03")
-        self.s03_buton.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-        )
-        self.s03_buton.clicked.connect(
-            lambda state: self.tag_subdiv(self.subdiv_taglist[3])
-        )
-        self.tags_buttons_layout.addWidget(self.s03_buton, 4)
-
-        self.s04_buton = QtWidgets.QPushButton("Tag s04")
-        self.s04_buton.setSizePolicy(
-            QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-        )
-        self.s04_buton.clicked.connect(
-            lambda state: self.tag_subdiv(self.subdiv_taglist[4])
-        )
-        self.tags_buttons_layout.addWidget(self.s04_buton, 5)
+        # One label and a grid of buttons per exclusive group of the config
+        self.group_buttons = {}
+        for group in self.exclusive_groups:
+            self.tags_buttons_layout.addWidget(QtWidgets.QLabel(group.name))
+            group_layout = QtWidgets.QGridLayout()
+            for position, tag in enumerate(group.tags):
+                button = QtWidgets.QPushButton(f"Tag {tag}")
+                button.setToolTip(
+                    f"Tag the objects with {tag}"
+                    f" and remove the other {group.name} tags"
+                )
+                button.setSizePolicy(
+                    QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
+                )
+                button.clicked.connect(
+                    lambda state, tag=tag: self.set_exclusive_tag(tag)
+                )
+                group_layout.addWidget(
+                    button,
+                    position // GROUP_BUTTON_COLUMNS,
+                    position % GROUP_BUTTON_COLUMNS,
+                )
+                self.group_buttons[tag] = button
+            self.tags_buttons_layout.addLayout(group_layout)
 
         self.smooth_buton = QtWidgets.QPushButton("Smooth")
         self.smooth_buton.setSizePolicy(
@@ -242,10 +454,6 @@ class guerillaTagsEditor(QtWidgets.QDialog):
                 0, 60, QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Expanding
             )
         )
-        for buttons in self.tags_buttons_layout.children():
-            buttons.setSizePolicy(
-                QtWidgets.QSizePolicy.Fixed, QtWidgets.QSizePolicy.Fixed
-            )
 
         self.button_layout_one = QtWidgets.QHBoxLayout()
         self.main_layout.addLayout(self.button_layout_one, 3)
@@ -258,6 +466,14 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.button_layout_two.addWidget(self.merge_selection)
         self.button_layout_two.addWidget(self.merge_all_tags)
         self.button_layout_two.addWidget(self.tag_materials)
+        self.button_layout_two.addWidget(self.apply_rules_button)
+
+        self.button_layout_three = QtWidgets.QHBoxLayout()
+        self.main_layout.addLayout(self.button_layout_three, 5)
+        self.button_layout_three.addWidget(self.merge_in_scene_button)
+        self.button_layout_three.addWidget(self.lint_button)
+        self.button_layout_three.addWidget(self.export_tags_button)
+        self.button_layout_three.addWidget(self.import_tags_button)
 
         self.tag_mode_layout = QtWidgets.QHBoxLayout()
         self.tag_mode_layout.addWidget(self.get_selection_check, 0)
@@ -269,7 +485,13 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.main_layout.addWidget(self.selection_label)
         self.main_layout.addLayout(self.tag_mode_layout)
         self.main_layout.addWidget(self.option_label)
-        self.main_layout.addWidget(self.highlight_shared_tags)
+        self.options_layout = QtWidgets.QHBoxLayout()
+        self.options_layout.addWidget(self.highlight_shared_tags)
+        self.options_layout.addWidget(self.select_partial_button)
+        self.options_layout.addWidget(self.sort_dropped_check)
+        self.options_layout.addWidget(self.profile_check)
+        self.main_layout.addLayout(self.options_layout)
+        self.main_layout.addWidget(self.profile_label)
 
         for widget in self.tag_mode_layout.children():
             widget.setAlignment(QtCore.Qt.AlignBottom)
@@ -281,110 +503,314 @@ class guerillaTagsEditor(QtWidgets.QDialog):
             event.ignore()
 
     def dropEvent(self, event):
-        data = event.mimeData().text()
-        list = data.split("\n")
-        children_list = []
-        tag_list = []
-        for obj in list:
-            # Loop on selected objects
-            if self.get_children_check.isChecked():
-                children = cmds.listRelatives(obj)
-                if children:
-                    # Get the shape that contains the Guerilla Tags
-                    for child in children:
-                        if (
-                            child not in children_list
-                            and cmds.nodeType(child) == "transform"
-                        ):
-                            children_list.append(child)
-            if tag_utils.has_gtags_attribute(obj) and not tag_utils.is_gtags_empty(obj):
-                obj_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                for tags in obj_tags:
-                    if tags not in tag_list:
-                        tag_list.append(tags)
-                    else:
-                        pass
-        for child in children_list:
-            if tag_utils.has_gtags_attribute(child) and not tag_utils.is_gtags_empty(
-                child
-            ):
-                obj_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(child)
-                )
-                for tags in obj_tags:
-                    if tags not in tag_list:
-                        tag_list.append(tags)
-                    else:
-                        pass
-        line_edit_text = tag_utils.convert_gtags_in_string(tag_list)
-        self.tag_input.setText(line_edit_text)
+        """
+        Put in the line edit the tags of the objects dropped from the outliner,
+        with their descendants in children and Scene modes
+        """
+        with tag_profiling.get_profiler().action("drop"):
+            objects, tag_counts = tag_caching.get_dropped_tags(
+                self.scene_cache,
+                event.mimeData().text().splitlines(),
+                self.affect_mode,
+                self.object_blacklist,
+                self.sort_dropped_check.isChecked(),
+            )
+            self.tag_input.setText(tag_utils.convert_gtags_in_string(list(tag_counts)))
+            self.tag_input.setToolTip(
+                f"Tags of {len(objects)} dropped objects : "
+                + ", ".join(f"{tag} ({count})" for tag, count in tag_counts.items())
+            )
 
     def generate_selection_scriptjob(self):
-        # Script job that refresh the blacklist and refresh_tag_list_widget
+        # Script job that refresh_tag_list_widget
         self.script_job = cmds.scriptJob(
             event=["SelectionChanged", self.scriptjob_exec], protected=False
         )
+        self.save_script_job = cmds.scriptJob(
+            event=["SceneSaved", self.save_disk_cache], protected=False
+        )
 
     def scriptjob_exec(self):
-        logger.warning("Changing selection")
-        self.update_blacklist()
-        self.refresh_tag_list_widget()
+        # The Scene mode list does not depend on the selection, a selection change
+        # only cancels the running scan, as documented in the README
+        if self.affect_mode == "all":
+            if self.scan is not None:
+                self.cancel_scan_from_user()
+            return
+        # Restarting the timer drops the events already waiting for a refresh
+        self.selection_timer.start()
+
+    def refresh_on_selection_changed(self):
+        logger.info("Changing selection")
+        with tag_profiling.get_profiler().action("selection changed"):
+            self.refresh_tag_list_widget()
+
+    def showEvent(self, event):
+        super(guerillaTagsEditor, self).showEvent(event)
+        if self.script_job is None:
+            with self.timed_phase("scene tracking"):
+                self.generate_selection_scriptjob()
+                self.scene_watcher.start()
+            # Read the scene once the window is drawn
+            QtCore.QTimer.singleShot(0, self.first_refresh)
+
+    def first_refresh(self):
+        with self.timed_phase("first refresh"):
+            self.refresh_tag_list_widget()
+        logger.info(
+            "Editor startup : "
+            + ", ".join(
+                f"{phase} {duration * 1000:.1f} ms"
+                for phase, duration in self.startup_timings.items()
+            )
+        )
 
     def closeEvent(self, event):
         logger.info("Closing Gtags editor event")
+        self.selection_timer.stop()
+        self.verification_timer.stop()
+        self.cancel_scan()
+        self.scan_cancelled = False
+        # Skipped while the cache loaded from disk is not verified yet
+        self.save_disk_cache()
+        self.verification = None
         cmds.scriptJob(kill=self.script_job)
+        cmds.scriptJob(kill=self.save_script_job)
+        self.script_job = None
+        self.save_script_job = None
+        self.scene_watcher.stop()
+        self.profile_check.setChecked(False)
+        # Nothing keeps the cache coherent while the window is closed, it is
+        # filled again from the disk cache when the window is shown
+        self.scene_cache.clear()
+        self.disk_cache_scene = None
         event.accept()
 
-    def check_shared_tags(self):
+    def load_disk_cache(self):
+        """
+        Fill the scene cache from the disk cache when another scene is opened, then
+        check it against the scene at idle time if the scene was saved or edited
+        since
+        :return:
+        """
+        scene_path = tag_utils.get_scene_path()
+        if scene_path == self.disk_cache_scene:
+            return
+        self.disk_cache_scene = scene_path
+        self.verification_timer.stop()
+        self.verification = None
+        if not scene_path:
+            return
+        objects, unverified_objects = tag_caching.load_scene_cache(
+            self.disk_cache, self.scene_cache, scene_path
+        )
+        logger.info(f"Loaded {len(objects)} objects from the disk cache")
+        if unverified_objects:
+            self.verification = tag_caching.verify_objects(
+                self.scene_cache, unverified_objects
+            )
+            self.verification_timer.start()
+
+    def continue_verification(self):
+        try:
+            next(self.verification)
+        except StopIteration:
+            self.verification_timer.stop()
+            self.verification = None
+        # The selection tags follow the index changes, only the list is outdated
+        if self.scan is None:
+            self.tag_model.set_tags(self.selection_tags.get_tags())
+
+    def start_scan(self, missing_objects: list):
+        """
+        Read the objects missing from the scene cache from the idle loop, the list
+        fills in as they are read
+        :param missing_objects:
+        :return:
+        """
+        self.label_title.setText("Tags on scene objects")
+        self.run_scan(
+            tag_caching.scan_selection_tags(self.selection_tags, missing_objects),
+            len(missing_objects),
+        )
+
+    def run_scan(self, scan, count: int):
+        """
+        Run the scan from the idle loop with the progress bar
+        :param scan: generator yielding the number of objects read per slice
+        :param count: number of objects to read
+        :return:
+        """
+        self.scan = scan
+        self.scan_progress.setRange(0, count)
+        self.scan_progress.setValue(0)
+        self.scan_progress.setVisible(True)
+        self.cancel_scan_button.setVisible(True)
+        self.scan_timer.start()
+
+    def continue_scan(self):
+        with tag_profiling.get_profiler().action("scene scan"):
+            try:
+                count = next(self.scan)
+            except StopIteration:
+                scan_finished = self.scan_finished
+                self.cancel_scan()
+                if scan_finished is not None:
+                    scan_finished()
+                return
+            self.scan_progress.setValue(self.scan_progress.value() + count)
+            self.tag_model.set_tags(self.selection_tags.get_tags())
+
+    def cancel_scan(self):
+        """
+        Stop the scene scan, the objects already read stay in the scene cache
+        :return:
+        """
+        self.scan_timer.stop()
+        self.scan = None
+        self.scan_finished = None
+        self.scan_progress.setVisible(False)
+        self.cancel_scan_button.setVisible(False)
+
+    def cancel_scan_from_user(self):
+        self.cancel_scan()
+        self.scan_cancelled = True
+        self.label_title.setText("Tags on scene objects (scan cancelled)")
+
+    def save_disk_cache(self):
+        """
+        Save the scene cache to disk when it matches the saved scene
+        :return:
+        """
+        scene_path = tag_utils.get_scene_path()
+        if (
+            scene_path
+            and self.verification is None
+            and len(self.scene_cache)
+            and not tag_utils.is_scene_modified()
+        ):
+            self.disk_cache_scene = scene_path
+            self.disk_cache.save(scene_path, self.scene_cache)
+
+    def set_profiling(self, enabled: bool):
+        """
+        Route the Maya calls of the editor through the profiler
+        :param enabled:
+        :return:
+        """
+        profiler = tag_profiling.get_profiler()
+        self.profile_label.setVisible(enabled)
+        if enabled:
+            profiler.enable([tag_utils, sys.modules[__name__]])
+            profiler.listeners.append(self.show_action_report)
+            self.profile_label.setText("Waiting for an action")
+        else:
+            if self.show_action_report in profiler.listeners:
+                profiler.listeners.remove(self.show_action_report)
+            profiler.disable()
+
+    def show_action_report(self, report: tag_profiling.ActionReport):
+        summary = report.format()
+        logger.info(summary)
+        self.profile_label.setText(summary)
+
+    def with_scene_mask(self, action) -> None:
+        """
+        Run the action with the bitset of the scene objects. The objects missing
+        from the scene cache are read first from the idle loop, through the Scene
+        mode scan in Scene mode, instead of freezing Maya.
+        :param action: callable taking the bitset
+        :return:
+        """
+        objects = tag_caching.get_affected_objects("all", self.object_blacklist)
+        missing_objects = [obj for obj in objects if obj not in self.scene_cache]
+        if not missing_objects:
+            action(self.scene_cache.get_mask(objects))
+            return
+        if self.affect_mode == "all":
+            # A cancelled Scene mode scan is resumed, the list fills in too
+            self.scan_cancelled = False
+            if self.scan is None:
+                self.start_scan(missing_objects)
+        else:
+            self.cancel_scan()
+            self.run_scan(
+                (
+                    len(chunk)
+                    for chunk in tag_caching.scan_objects(
+                        self.scene_cache, missing_objects
+                    )
+                ),
+                len(missing_objects),
+            )
+        self.scan_finished = lambda: action(self.scene_cache.get_mask(objects))
+
+    def select_query(self):
         """
-        Modify widget if their tag is shared with all selection
+        Select the scene objects matching the query of the query line edit
         :return:
         """
-        list_widget_items = []
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for i in range(self.tag_list.count()):
-            list_widget_items.append(self.tag_list.item(i))
-
-        for items in list_widget_items:
-            is_shared = True
-            tag = items.text()
-            for obj in selection:
-                if not tag_utils.has_gtags_attribute(obj):
-                    is_shared = False
-                elif tag_utils.is_gtags_empty(obj):
-                    is_shared = False
-                elif tag not in tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                ):
-                    is_shared = False
-            if is_shared:
-                items.setIcon(self.shared_tag_icon)
-            else:
-                items.setIcon(QtGui.QIcon())
-
-    def add_item_to_list(self):
-        item = QtWidgets.QListWidgetItem("Hello")
-        item.setIcon(self.all_icons)
-        item.setSizeHint(QtCore.QSize(20, 30))
-        self.tag_list.addItem(item)
+        try:
+            query = tag_query.TagQuery(self.query_input.text())
+        except ValueError as error:
+            logger.warning(str(error))
+            return
+
+        def select(scene_mask: int):
+            with tag_profiling.get_profiler().action("select query"):
+                objects = self.scene_cache.get_objects_from_mask(
+                    query.get_mask(self.scene_cache, scene_mask)
+                )
+                tag_utils.select_objects(objects)
+            logger.info(f"Query {query.expression!r} selected {len(objects)} objects")
+
+        self.with_scene_mask(select)
+
+    def select_tag_objects(self, model_index):
+        """
+        Select every scene object carrying the double clicked tag
+        :param model_index:
+        :return:
+        """
+        tag = model_index.data(QtCore.Qt.UserRole)
+
+        def select(scene_mask: int):
+            with tag_profiling.get_profiler().action("select tag"):
+                objects = self.scene_cache.get_objects_from_mask(
+                    self.scene_cache.get_tag_mask(tag) & scene_mask
+                )
+                tag_utils.select_objects(objects)
+
+        self.with_scene_mask(select)
+
+    def select_partial_tags(self):
+        """
+        Select in the list the tags carried by only a part of the selection
+        :return:
+        """
+        selection_count = len(self.selection_tags.objects)
+        item_selection = QtCore.QItemSelection()
+        for row, tag in enumerate(self.tag_model.tags):
+            if self.selection_tags.get_coverage(tag) < selection_count:
+                model_index = self.tag_model.index(row)
+                item_selection.select(model_index, model_index)
+        self.tag_list.selectionModel().select(
+            item_selection, QtCore.QItemSelectionModel.ClearAndSelect
+        )
 
     def get_items_on_list(self):
         """
         Get the list of tags on the list widget
         :return:
         """
-        list_widget_items = []
-        for i in range(self.tag_list.count()):
-            list_widget_items.append(self.tag_list.item(i).text())
-        return list_widget_items
+        return list(self.tag_model.tags)
 
     def set_mode_on_selection(self):
         self.get_selection_check.setChecked(True)
         self.get_all_check.setChecked(False)
         self.get_children_check.setChecked(False)
         self.affect_mode = "selection"
+        self.scan_cancelled = False
         self.label_title.setText("Tags on selection")
         self.refresh_tag_list_widget()
 
@@ -393,6 +819,7 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.get_all_check.setChecked(False)
         self.get_selection_check.setChecked(False)
         self.affect_mode = "children"
+        self.scan_cancelled = False
         self.label_title.setText("Tags on selection and children")
         self.refresh_tag_list_widget()
 
@@ -401,104 +828,181 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         self.get_selection_check.setChecked(False)
         self.get_children_check.setChecked(False)
         self.affect_mode = "all"
+        self.scan_cancelled = False
         self.label_title.setText("Tags on scene objects")
         self.refresh_tag_list_widget()
 
     def clear_list(self):
-        self.tag_list.clear()
+        self.tag_model.set_tags([])
+
+    def get_selection(self):
+        """
+        Get the objects affected by the current mode, without the blacklisted ones
+        :return:
+        """
+        return tag_caching.get_affected_objects(self.affect_mode, self.object_blacklist)
 
     def refresh_tag_list_widget(self):
         logger.info("Refreshing list widget")
-        tags_to_push = []
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for obj in selection:
-            if tag_utils.has_gtags_attribute(obj) and not tag_utils.is_gtags_empty(obj):
-                attr = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                for tags in attr:
-                    if tags not in tags_to_push:
-                        tags_to_push.append(tags)
-        self.tag_list.clear()
-        for new_tags in tags_to_push:
-            item = QtWidgets.QListWidgetItem(new_tags)
-            item.setSizeHint(QtCore.QSize(20, 30))
-            self.tag_list.addItem(item)
-        if self.highlight_shared_tags.isChecked() and len(selection) > 1:
-            self.check_shared_tags()
+        profiler = tag_profiling.get_profiler()
+        # A mode or selection change makes the running scan out of date
+        self.cancel_scan()
+        self.load_disk_cache()
+        with profiler.phase("selection"):
+            selection = self.get_selection()
+        # Only the objects added to the selection since last refresh are read, the
+        # scene is read progressively in Scene mode
+        with profiler.phase("selection tags"):
+            missing_objects = tag_caching.refresh_selection_tags(
+                self.selection_tags, selection, progressive=self.affect_mode == "all"
+            )
+            if missing_objects and not self.scan_cancelled:
+                self.start_scan(missing_objects)
+        with profiler.phase("list rebuild"):
+            self.tag_model.highlight_shared = self.highlight_shared_tags.isChecked()
+            self.tag_model.set_tags(self.selection_tags.get_tags())
+
+    def get_selected_tags(self):
+        """
+        Get the tags selected in the list widget
+        :return:
+        """
+        return [
+            model_index.data(QtCore.Qt.UserRole)
+            for model_index in self.tag_list.selectionModel().selectedRows()
+        ]
 
     @then_refresh
     def replace_tags(self):
         """
         Replace tags by taking in account the selected tags in the list
         """
-
-        selected_tags = []
-        selection = tag_utils.get_clean_selection(self.affect_mode)
         line_edit_tags = tag_utils.convert_gtags_in_list(self.tag_input.text())
-        for items in self.tag_list.selectedItems():
-            selected_tags.append(items.text())
-        for obj in selection:
-            obj_tags = tag_utils.convert_gtags_in_list(
-                tag_utils.get_gtags_attribute(obj)
-            )
-            add_tags = False
-            for tags in obj_tags:
-                if tags in selected_tags:
-                    obj_tags.remove(tags)
-                    add_tags = True
-            if add_tags:
-                for tags in line_edit_tags:
-                    if not tags in obj_tags:
-                        obj_tags.append(tags)
-            tag_utils.set_gtags_attribute(
-                obj, tag_utils.convert_gtags_in_string(obj_tags)
-            )
+        tag_edit.replace_tags(
+            self.scene_cache,
+            self.get_selection(),
+            self.get_selected_tags(),
+            line_edit_tags,
+        )
+
+    @then_refresh
+    def merge_tags_in_scene(self):
+        """
+        Rename or merge the tags selected in the list to the tag in the line edit,
+        on every object of the scene carrying them
+        """
+        old_tags = self.get_selected_tags()
+        new_tags = [
+            tag for tag in tag_utils.convert_gtags_in_list(self.tag_input.text()) if tag
+        ]
+        if not old_tags or len(new_tags) != 1:
+            logger.warning("Select the tags to rename in the list and type one new tag")
+            return
+        changed = tag_edit.merge_tags(
+            self.scene_cache,
+            tag_caching.get_affected_objects("all", self.object_blacklist),
+            old_tags,
+            new_tags[0],
+        )
+        logger.info(
+            f"Renamed {', '.join(old_tags)} to {new_tags[0]} on {changed} objects"
+        )
 
     @then_refresh
     def delete_tags(self):
-        selected_tags = []
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for items in self.tag_list.selectedItems():
-            selected_tags.append(items.text())
-        for obj in selection:
-            old_tags = tag_utils.convert_gtags_in_list(
-                tag_utils.get_gtags_attribute(obj)
-            )
-            for tags in selected_tags:
-                if tags in old_tags:
-                    old_tags.remove(tags)
-                else:
-                    pass
-            tags_replace = tag_utils.convert_gtags_in_string(old_tags)
-            tag_utils.set_gtags_attribute(obj, tags_replace)
+        tag_edit.remove_tags(
+            self.scene_cache, self.get_selection(), self.get_selected_tags()
+        )
 
     @then_refresh
     def add_tag_materials(self):
-        for obj in tag_utils.get_clean_selection(self.affect_mode):
-            matname = tag_utils.get_obj_material(obj)
-            logger.info(f"Object material name : {matname}")
-            if tag_utils.has_gtags_attribute(obj):
-                obj_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                if not tag_utils.is_gtags_empty(obj):
-                    for tags in obj_tags:
-                        # Loop to delete old material name that is not the connected one
-                        if tags == matname:
-                            return
-                        elif tags in self.materials_taglist:
-                            obj_tags.remove(tags)
-
-                    obj_tags.append(tag_utils.get_obj_material(obj))
-                    tag_utils.set_gtags_attribute(
-                        obj, tag_utils.convert_gtags_in_string(obj_tags)
-                    )
-                else:
-                    tag_utils.set_gtags_attribute(obj, matname)
-            else:
-                tag_utils.create_gtags_attribute(obj)
-                tag_utils.set_gtags_attribute(obj, matname)
+        tag_edit.tag_materials(
+            self.scene_cache, self.get_selection(), self.material_cache
+        )
+
+    def apply_tag_rules(self):
+        # The file is asked before the undo chunk and the profiled action open
+        rules_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Apply tag rules", "", "Tag rules (*.json)"
+        )
+        if rules_path:
+            self.apply_rules_file(rules_path)
+
+    @then_refresh
+    def apply_rules_file(self, rules_path: str):
+        changed = tag_rules.apply_rules(
+            self.scene_cache,
+            tag_rules.load_rules(rules_path),
+            self.get_selection(),
+            self.material_cache,
+        )
+        logger.info(f"Tag rules changed {changed} objects")
+
+    def lint_tags(self):
+        """
+        Lint the tags of every transform of the scene and offer to fix them
+        :return:
+        """
+        with tag_profiling.get_profiler().action("lint_tags"):
+            report = tag_lint.run_lint(
+                material_cache=self.material_cache,
+                object_blacklist=self.object_blacklist,
+            )
+        summary = ", ".join(
+            f"{count} {issue}" for issue, count in report["issues"].items() if count
+        )
+        logger.info(
+            f"Tags lint : {len(report['entries'])} of {report['objects']} objects"
+            f" with issues" + (f" ({summary})" if summary else "")
+        )
+        for entry in report["entries"][:LINT_LOG_LIMIT]:
+            logger.info(f"{entry['object']} : {', '.join(entry['issues'])}")
+        if not report["entries"]:
+            return
+        # Answered before the undo chunk of the fix opens
+        answer = QtWidgets.QMessageBox.question(
+            self,
+            "Lint tags",
+            f"{len(report['entries'])} objects have dirty tags ({summary}).\n"
+            "Fix them ?",
+        )
+        if answer == QtWidgets.QMessageBox.Yes:
+            self.fix_lint_issues(report)
+
+    @then_refresh
+    def fix_lint_issues(self, report: dict):
+        fixed = tag_lint.apply_lint_fixes(report, self.scene_cache)
+        logger.info(f"Tags lint fixed {fixed} objects")
+
+    def export_tags(self):
+        snapshot_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self,
+            "Export tags",
+            "",
+            "Tags snapshot (*.jsonl);;Binary tags snapshot (*.gts)",
+        )
+        if not snapshot_path:
+            return
+        count = tag_caching.export_snapshot(
+            snapshot_path,
+            self.scene_cache,
+            self.get_selection(),
+            binary=snapshot_path.endswith(".gts"),
+        )
+        logger.info(f"Exported the tags of {count} objects to {snapshot_path}")
+
+    def import_tags(self):
+        # The file is asked before the undo chunk and the profiled action open
+        snapshot_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Import tags", "", "Tags snapshot (*.jsonl *.gts)"
+        )
+        if snapshot_path:
+            self.import_snapshot_file(snapshot_path)
+
+    @then_refresh
+    def import_snapshot_file(self, snapshot_path: str):
+        changed = tag_caching.import_snapshot(snapshot_path, self.scene_cache)
+        logger.info(f"Imported tags changed {changed} objects")
 
     @then_refresh
     def add_gtags(self):
@@ -509,97 +1013,32 @@ class guerillaTagsEditor(QtWidgets.QDialog):
         logger.warning("Adding Gtags")
         # Check line edit string
         if self.tag_input.text() and not self.tag_input.text().isspace():
-            # Get selection
-            selection = tag_utils.get_clean_selection(self.affect_mode)
-            line_edit_tags = self.tag_input.text()
-            new_tags = tag_utils.convert_gtags_in_list(line_edit_tags)
-            for obj in selection:
-                if not tag_utils.has_gtags_attribute(obj):
-                    tag_utils.create_gtags_attribute(obj)
-                if tag_utils.is_gtags_empty(obj):
-                    tag_utils.set_gtags_attribute(obj, line_edit_tags)
-                else:
-                    old_tags = tag_utils.convert_gtags_in_list(
-                        tag_utils.get_gtags_attribute(obj)
-                    )
-                    for tags in new_tags:
-                        if tags not in old_tags:
-                            tag_utils.add_gtag_to_attr(obj, tags)
-                    else:
-                        pass
+            new_tags = tag_utils.convert_gtags_in_list(self.tag_input.text())
+            tag_edit.add_tags(self.scene_cache, self.get_selection(), new_tags)
 
     @then_refresh
-    def tag_subdiv(self, subidv):
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for obj in selection:
-            if tag_utils.has_gtags_attribute(obj):
-                old_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                for tags in old_tags:
-                    if tags in self.subdiv_taglist:
-                        old_tags.remove(tags)
-                    else:
-                        pass
-                    tags_replace = tag_utils.convert_gtags_in_string(old_tags)
-                    tag_utils.set_gtags_attribute(obj, tags_replace)
-                tag_utils.add_gtag_to_attr(obj, subidv)
-            else:
-                tag_utils.create_gtags_attribute(obj)
-                tag_utils.set_gtags_attribute(obj, subidv)
+    def set_exclusive_tag(self, tag: str):
+        """
+        Set the tag on the objects and remove the other tags of its group
+        :param tag:
+        :return:
+        """
+        tag_edit.set_exclusive_tags(
+            self.scene_cache, self.get_selection(), [tag], self.exclusive_groups
+        )
 
     @then_refresh
     def tag_smooth(self):
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for obj in selection:
-            if tag_utils.has_gtags_attribute(obj):
-                old_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                if "smooth" not in old_tags:
-                    tag_utils.add_gtag_to_attr(obj, "smooth")
-            else:
-                tag_utils.create_gtags_attribute(obj)
-                tag_utils.set_gtags_attribute(obj, "smooth")
+        tag_edit.add_tags(self.scene_cache, self.get_selection(), ["smooth"])
 
     @then_refresh
     def merge_selected_tags(self):
-        selected_tags = []
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for items in self.tag_list.selectedItems():
-            selected_tags.append(items.text())
-        for obj in selection:
-            if not tag_utils.has_gtags_attribute(obj):
-                tag_utils.create_gtags_attribute(obj)
-            if tag_utils.is_gtags_empty(obj):
-                tags = tag_utils.convert_gtags_in_string(selected_tags)
-                tag_utils.set_gtags_attribute(obj, tags)
-            else:
-                old_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                for tags in selected_tags:
-                    if tags not in old_tags:
-                        tag_utils.add_gtag_to_attr(obj, tags)
-                else:
-                    pass
+        tag_edit.add_tags(
+            self.scene_cache, self.get_selection(), self.get_selected_tags()
+        )
 
     @then_refresh
     def merge_all(self):
-        selected_tags = self.get_items_on_list()
-        selection = tag_utils.get_clean_selection(self.affect_mode)
-        for obj in selection:
-            if not tag_utils.has_gtags_attribute(obj):
-                tag_utils.create_gtags_attribute(obj)
-            elif tag_utils.is_gtags_empty(obj):
-                tags = tag_utils.convert_gtags_in_string(selected_tags)
-                tag_utils.set_gtags_attribute(obj, tags)
-            else:
-                old_tags = tag_utils.convert_gtags_in_list(
-                    tag_utils.get_gtags_attribute(obj)
-                )
-                for tags in selected_tags:
-                    if tags not in old_tags:
-                        tag_utils.add_gtag_to_attr(obj, tags)
-                else:
-                    pass
+        tag_edit.add_tags(
+            self.scene_cache, self.get_selection(), self.get_items_on_list()
+        )
@@ -1,10 +1,38 @@
-import gui
 import importlib
 
-importlib.reload(gui)
+from shiboken2 import isValid
+
+import gui
+
+_editor = None
 
 
-def execute():
-    print("Updated")
-    win = gui.guerillaTagsEditor()
-    win.show()
+def execute(reload=False):
+    """
+    Show the Guerilla Tags editor, the same window is reused between calls
+    :param reload: reload the modules of the tool first, while developing it
+    """
+    global _editor
+    if reload:
+        if _editor is not None:
+            _editor.close()
+            _editor.deleteLater()
+            _editor = None
+        for module in [
+            "path_utils",
+            "tag_utils",
+            "tag_edit",
+            "tag_caching",
+            "tag_callbacks",
+            "tag_rules",
+            "tag_profiling",
+            "tag_query",
+            "tag_lint",
+            "gui",
+        ]:
+            importlib.reload(importlib.import_module(module))
+    if _editor is None or not isValid(_editor):
+        _editor = gui.guerillaTagsEditor()
+    _editor.show()
+    _editor.raise_()
+    _editor.activateWindow()
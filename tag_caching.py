@@ -1,4 +1,1081 @@
+import collections
+import hashlib
 import json
+import os
+import sys
+import time
+import zlib
 
-is_cached = False
-scene_cache = {}
+import tag_utils
+import tag_edit
+
+# Module related to the tags cache kept by the editor between actions
+
+# A tag column is stored as a bitset once more than one object ID in
+# DENSE_COLUMN_RATIO carries the tag, and as a set of object IDs below a quarter
+# of that, a bitset costs one bit per object ID and a set about 30 bytes per
+# member
+DENSE_COLUMN_RATIO = 128
+
+
+def parse_gtags(gtags) -> list:
+    """
+    Convert an attribute value read by tag_utils.read_gtags into a list of tags
+    :param gtags: string or None
+    :return:
+    """
+    if not gtags:
+        return []
+    return [tag for tag in tag_utils.convert_gtags_in_list(gtags) if tag]
+
+
+class TagIndex(object):
+    """
+    Two-way index of the GuerillaTags read from the scene.
+    Every distinct tag and object is interned to an integer ID : an object
+    stores the tuple of its tag IDs and a tag stores the object IDs carrying it,
+    so unions, intersections and coverage are bitwise operations on whole
+    columns instead of loops over strings. The column of a common tag is a
+    bitset, the column of a rare tag a set of object IDs turned into a bitset
+    when queried.
+    """
+
+    def __init__(self):
+        self.tag_ids = {}
+        self.tag_names = []
+        # tag ID -> bitset or set of the object IDs carrying the tag, and their
+        # number
+        self.tag_columns = []
+        self.tag_sizes = []
+        self.object_ids = {}
+        # object ID -> name and tuple of tag IDs, None once removed
+        self.object_names = []
+        self.object_rows = []
+        self.free_object_ids = []
+        # IDs of the cached objects that do not have the GuerillaTags attribute
+        self.missing_attribute = set()
+        # Callables notified with (obj, old_tags, new_tags) on every change,
+        # and when an object enters or leaves the index. obj is None once the
+        # whole index was cleared.
+        self.listeners = []
+
+    def __contains__(self, obj: str) -> bool:
+        return obj in self.object_ids
+
+    def __len__(self) -> int:
+        return len(self.object_ids)
+
+    def clear(self) -> None:
+        """
+        Forget every cached object
+        :return:
+        """
+        self.tag_ids = {}
+        self.tag_names = []
+        self.tag_columns = []
+        self.tag_sizes = []
+        self.object_ids = {}
+        self.object_names = []
+        self.object_rows = []
+        self.free_object_ids = []
+        self.missing_attribute = set()
+        self._notify(None, [], [])
+
+    def get_cached_objects(self) -> list:
+        """
+        Get every object read in the index
+        :return:
+        """
+        return list(self.object_ids)
+
+    def intern_tag(self, tag: str) -> int:
+        """
+        Get the ID of the tag, creating it for a new tag
+        :param tag:
+        :return:
+        """
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self.tag_names)
+            self.tag_ids[tag] = tag_id
+            self.tag_names.append(sys.intern(tag))
+            self.tag_columns.append(set())
+            self.tag_sizes.append(0)
+        return tag_id
+
+    def has_attribute(self, obj: str) -> bool:
+        """
+        Check whether the cached object has the GuerillaTags attribute
+        :param obj:
+        :return:
+        """
+        object_id = self.object_ids.get(obj)
+        return object_id is not None and object_id not in self.missing_attribute
+
+    def get_tags(self, obj: str) -> list:
+        """
+        Get the cached tags of the object
+        :param obj:
+        :return:
+        """
+        return [self.tag_names[tag_id] for tag_id in self.get_tag_ids(obj)]
+
+    def get_tag_ids(self, obj: str) -> tuple:
+        """
+        Get the IDs of the cached tags of the object
+        :param obj:
+        :return:
+        """
+        object_id = self.object_ids.get(obj)
+        if object_id is None:
+            return ()
+        return self.object_rows[object_id]
+
+    def get_objects(self, tag: str) -> set:
+        """
+        Get the cached objects carrying the tag
+        :param tag:
+        :return:
+        """
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            return set()
+        column = self.tag_columns[tag_id]
+        if isinstance(column, set):
+            return {self.object_names[object_id] for object_id in column}
+        return set(self.get_objects_from_mask(column))
+
+    def get_all_tags(self) -> list:
+        """
+        Get the tags carried by at least one cached object
+        :return:
+        """
+        return [tag for tag, size in zip(self.tag_names, self.tag_sizes) if size]
+
+    def set_tags(self, obj: str, tags: list, has_attribute: bool = True) -> None:
+        """
+        Store the tags of the object and update the tag columns
+        :param obj:
+        :param tags:
+        :param has_attribute: False if the object has no GuerillaTags attribute
+        :return:
+        """
+        self.set_tags_many([(obj, tags, has_attribute)])
+
+    def set_tags_many(self, entries) -> None:
+        """
+        Store the tags of many objects. The object IDs entering and leaving each
+        tag are collected first and every tag column is rebuilt once, instead of
+        once per object.
+        :param entries: (obj, tags, has_attribute) tuples, the last one wins when
+        an object is given several times
+        :return:
+        """
+        entries = {obj: (tags, has_attribute) for obj, tags, has_attribute in entries}
+        # tag ID -> object IDs to set or to clear in the tag column
+        added_ids = collections.defaultdict(list)
+        removed_ids = collections.defaultdict(list)
+        changes = []
+        for obj, (tags, has_attribute) in entries.items():
+            object_id = self.object_ids.get(obj)
+            is_new = object_id is None
+            if is_new:
+                object_id = self._new_object_id(obj)
+                old_row = ()
+            else:
+                old_row = self.object_rows[object_id]
+            row = self._get_row(tags)
+            if row != old_row:
+                if is_new:
+                    for tag_id in row:
+                        added_ids[tag_id].append(object_id)
+                else:
+                    for tag_id in set(old_row).difference(row):
+                        removed_ids[tag_id].append(object_id)
+                    for tag_id in set(row).difference(old_row):
+                        added_ids[tag_id].append(object_id)
+                self.object_rows[object_id] = row
+                changes.append((obj, old_row, row))
+            elif is_new:
+                changes.append((obj, old_row, row))
+            if has_attribute:
+                self.missing_attribute.discard(object_id)
+            else:
+                self.missing_attribute.add(object_id)
+        for tag_id, object_ids in removed_ids.items():
+            self._remove_from_column(tag_id, object_ids)
+        for tag_id, object_ids in added_ids.items():
+            self._add_to_column(tag_id, object_ids)
+        if self.listeners:
+            tag_names = self.tag_names
+            for obj, old_row, row in changes:
+                self._notify(
+                    obj,
+                    [tag_names[tag_id] for tag_id in old_row],
+                    [tag_names[tag_id] for tag_id in row],
+                )
+
+    def remove_object(self, obj: str) -> None:
+        """
+        Remove the object from the index, e.g. when it is deleted
+        :param obj:
+        :return:
+        """
+        self.remove_objects([obj])
+
+    def remove_objects(self, objects) -> None:
+        """
+        Remove many objects from the index, every tag column is rebuilt once
+        :param objects:
+        :return:
+        """
+        removed_ids = collections.defaultdict(list)
+        changes = []
+        for obj in objects:
+            object_id = self.object_ids.pop(obj, None)
+            if object_id is None:
+                continue
+            old_row = self.object_rows[object_id]
+            for tag_id in old_row:
+                removed_ids[tag_id].append(object_id)
+            self.missing_attribute.discard(object_id)
+            self.object_names[object_id] = None
+            self.object_rows[object_id] = None
+            self.free_object_ids.append(object_id)
+            changes.append((obj, old_row))
+        for tag_id, object_ids in removed_ids.items():
+            self._remove_from_column(tag_id, object_ids)
+        for obj, old_row in changes:
+            self._notify(obj, [self.tag_names[tag_id] for tag_id in old_row], [])
+
+    def rename_object(self, old_name: str, new_name: str) -> None:
+        """
+        Move the cached tags of a renamed object to its new name
+        :param old_name:
+        :param new_name:
+        :return:
+        """
+        if old_name not in self.object_ids:
+            return
+        tags = self.get_tags(old_name)
+        has_attribute = self.has_attribute(old_name)
+        self.remove_object(old_name)
+        self.set_tags(new_name, tags, has_attribute)
+
+    def ensure(self, objects: list) -> None:
+        """
+        Read the objects that are not cached yet from the scene
+        :param objects:
+        :return:
+        """
+        missing_objects = [obj for obj in objects if obj not in self.object_ids]
+        if not missing_objects:
+            return
+        self.set_tags_many(
+            (obj, parse_gtags(gtags), gtags is not None)
+            for obj, gtags in tag_utils.read_gtags(missing_objects).items()
+        )
+
+    def get_tags_on_objects(self, objects: list) -> list:
+        """
+        Get the tags present on the objects, in the order they are first found
+        :param objects:
+        :return:
+        """
+        return list(self.get_tag_counts_on_objects(objects))
+
+    def get_tag_counts_on_objects(self, objects: list) -> dict:
+        """
+        Count the objects carrying each tag, the tags in the order they are first
+        found
+        :param objects:
+        :return: {tag: count}
+        """
+        self.ensure(objects)
+        tag_counts = {}
+        for obj in objects:
+            for tag_id in self.get_tag_ids(obj):
+                tag_counts[tag_id] = tag_counts.get(tag_id, 0) + 1
+        return {self.tag_names[tag_id]: count for tag_id, count in tag_counts.items()}
+
+    # Bitset queries
+
+    def get_mask(self, objects: list) -> int:
+        """
+        Get the bitset of the cached objects of the list
+        :param objects:
+        :return:
+        """
+        object_ids = self.object_ids
+        return _build_mask([object_ids[obj] for obj in objects if obj in object_ids])
+
+    def get_all_mask(self) -> int:
+        """
+        Get the bitset of every cached object
+        :return:
+        """
+        return _build_mask(self.object_ids.values())
+
+    def get_tag_mask(self, tag: str) -> int:
+        """
+        Get the bitset of the objects carrying the tag
+        :param tag:
+        :return:
+        """
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            return 0
+        column = self.tag_columns[tag_id]
+        return _build_mask(column) if isinstance(column, set) else column
+
+    def get_objects_from_mask(self, mask: int) -> list:
+        """
+        Get the names of the objects of a bitset
+        :param mask:
+        :return:
+        """
+        object_names = self.object_names
+        return [object_names[object_id] for object_id in _get_mask_ids(mask)]
+
+    def get_objects_with_all(self, tags: list, mask: int = None) -> list:
+        """
+        Get the objects carrying every tag
+        :param tags:
+        :param mask: bitset restricting the objects, every cached object if None
+        :return:
+        """
+        result = self.get_all_mask() if mask is None else mask
+        for tag in tags:
+            result &= self.get_tag_mask(tag)
+        return self.get_objects_from_mask(result)
+
+    def get_objects_with_any(self, tags: list, mask: int = None) -> list:
+        """
+        Get the objects carrying at least one of the tags
+        :param tags:
+        :param mask: bitset restricting the objects, every cached object if None
+        :return:
+        """
+        result = 0
+        for tag in tags:
+            result |= self.get_tag_mask(tag)
+        if mask is not None:
+            result &= mask
+        return self.get_objects_from_mask(result)
+
+    def get_objects_lacking(self, tag: str, mask: int = None) -> list:
+        """
+        Get the objects that do not carry the tag
+        :param tag:
+        :param mask: bitset restricting the objects, every cached object if None
+        :return:
+        """
+        mask = self.get_all_mask() if mask is None else mask
+        return self.get_objects_from_mask(mask & ~self.get_tag_mask(tag))
+
+    def get_coverage(self, mask: int = None) -> dict:
+        """
+        Count the objects carrying each tag
+        :param mask: bitset restricting the objects, every cached object if None
+        :return: {tag: count} for the tags carried at least once
+        """
+        if mask is None:
+            return {
+                tag: size for tag, size in zip(self.tag_names, self.tag_sizes) if size
+            }
+        coverage = {}
+        # The sparse columns are intersected with the IDs of the mask
+        mask_ids = None
+        for tag, column in zip(self.tag_names, self.tag_columns):
+            if isinstance(column, set):
+                if column:
+                    if mask_ids is None:
+                        mask_ids = set(_get_mask_ids(mask))
+                    column = column & mask_ids
+                count = len(column)
+            else:
+                count = bin(column & mask).count("1")
+            if count:
+                coverage[tag] = count
+        return coverage
+
+    def _get_row(self, tags: list) -> tuple:
+        tag_ids = self.tag_ids
+        return tuple(
+            dict.fromkeys(
+                tag_ids[tag] if tag in tag_ids else self.intern_tag(tag)
+                for tag in tags
+                if tag
+            )
+        )
+
+    def _new_object_id(self, obj: str) -> int:
+        if self.free_object_ids:
+            object_id = self.free_object_ids.pop()
+            self.object_names[object_id] = obj
+            self.object_rows[object_id] = ()
+        else:
+            object_id = len(self.object_names)
+            self.object_names.append(obj)
+            self.object_rows.append(())
+        self.object_ids[obj] = object_id
+        return object_id
+
+    def _add_to_column(self, tag_id: int, object_ids: list) -> None:
+        # The object IDs do not carry the tag yet
+        size = self.tag_sizes[tag_id] + len(object_ids)
+        self.tag_sizes[tag_id] = size
+        column = self.tag_columns[tag_id]
+        if isinstance(column, set):
+            column.update(object_ids)
+            if size * DENSE_COLUMN_RATIO > len(self.object_names):
+                self.tag_columns[tag_id] = _build_mask(column)
+        else:
+            self.tag_columns[tag_id] = column | _build_mask(object_ids)
+
+    def _remove_from_column(self, tag_id: int, object_ids: list) -> None:
+        # The object IDs all carry the tag
+        size = self.tag_sizes[tag_id] - len(object_ids)
+        self.tag_sizes[tag_id] = size
+        column = self.tag_columns[tag_id]
+        if isinstance(column, set):
+            column.difference_update(object_ids)
+            return
+        column &= ~_build_mask(object_ids)
+        if size * DENSE_COLUMN_RATIO * 4 < len(self.object_names):
+            column = set(_get_mask_ids(column))
+        self.tag_columns[tag_id] = column
+
+    def _notify(self, obj: str, old_tags: list, new_tags: list) -> None:
+        for listener in self.listeners:
+            listener(obj, old_tags, new_tags)
+
+
+def _build_mask(object_ids) -> int:
+    """
+    Get the bitset of the object IDs, built in a bytearray so the cost is linear
+    instead of one big integer operation per ID
+    :param object_ids:
+    :return:
+    """
+    object_ids = list(object_ids)
+    if not object_ids:
+        return 0
+    bitmap = bytearray((max(object_ids) >> 3) + 1)
+    for object_id in object_ids:
+        bitmap[object_id >> 3] |= 1 << (object_id & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _get_mask_ids(mask: int):
+    """
+    Iterate over the object IDs of a bitset
+    :param mask:
+    :return:
+    """
+    bits = bin(mask)[:1:-1]
+    object_id = bits.find("1")
+    while object_id != -1:
+        yield object_id
+        object_id = bits.find("1", object_id + 1)
+
+
+class SelectionTags(object):
+    """
+    Count of the tags over the current selection, updated from the difference
+    between the previous and the new selection and from the index changes
+    """
+
+    def __init__(self, index: TagIndex):
+        self.index = index
+        # Selected objects in selection order, a dict to remove one in place
+        self.objects = {}
+        # tag -> number of selected objects carrying it, in first-seen order
+        self.tag_counts = {}
+        index.listeners.append(self.on_index_changed)
+
+    def update(self, objects: list) -> None:
+        """
+        Set the new selection, only the added objects are read from the scene
+        :param objects:
+        :return:
+        """
+        new_objects = dict.fromkeys(objects)
+        added_objects = [obj for obj in new_objects if obj not in self.objects]
+        removed_objects = [obj for obj in self.objects if obj not in new_objects]
+        self.index.ensure(added_objects)
+        for obj in removed_objects:
+            self._count(self.index.get_tags(obj), -1)
+        for obj in added_objects:
+            self._count(self.index.get_tags(obj), 1)
+        self.objects = new_objects
+
+    def extend(self, objects: list) -> None:
+        """
+        Add objects to the selection without comparing the whole selection again
+        :param objects:
+        :return:
+        """
+        added_objects = list(
+            dict.fromkeys(obj for obj in objects if obj not in self.objects)
+        )
+        self.index.ensure(added_objects)
+        for obj in added_objects:
+            self._count(self.index.get_tags(obj), 1)
+        self.objects.update(dict.fromkeys(added_objects))
+
+    def get_tags(self) -> list:
+        """
+        Get the tags present on the selection
+        :return:
+        """
+        return list(self.tag_counts)
+
+    def get_coverage(self, tag: str) -> int:
+        """
+        Get the number of selected objects carrying the tag
+        :param tag:
+        :return:
+        """
+        return self.tag_counts.get(tag, 0)
+
+    def get_shared_tags(self) -> list:
+        """
+        Get the tags carried by every selected object
+        :return:
+        """
+        count = len(self.objects)
+        return [tag for tag, tag_count in self.tag_counts.items() if tag_count == count]
+
+    def on_index_changed(self, obj: str, old_tags: list, new_tags: list) -> None:
+        if obj is None:
+            # Counted again when the next update reads the selection back
+            self.objects = {}
+            self.tag_counts = {}
+        elif obj in self.objects:
+            old_tag_set = set(old_tags)
+            new_tag_set = set(new_tags)
+            self._count([tag for tag in old_tags if tag not in new_tag_set], -1)
+            self._count([tag for tag in new_tags if tag not in old_tag_set], 1)
+            if obj not in self.index:
+                # Counted again when the next update reads it back
+                del self.objects[obj]
+
+    def _count(self, tags: list, step: int) -> None:
+        tag_counts = self.tag_counts
+        if step > 0:
+            for tag in tags:
+                tag_counts[tag] = tag_counts.get(tag, 0) + step
+            return
+        for tag in tags:
+            count = tag_counts.get(tag, 0) + step
+            if count > 0:
+                tag_counts[tag] = count
+            else:
+                tag_counts.pop(tag, None)
+
+
+class MaterialCache(object):
+    """
+    Member -> materials map resolved once from the shadingEngines, rebuilt only
+    after the shading assignments changed
+    """
+
+    def __init__(self):
+        self.assignments = None
+        self.materials = None
+
+    def invalidate(self) -> None:
+        """
+        Mark the map out of date, it will be rebuilt when next used
+        :return:
+        """
+        self.assignments = None
+        self.materials = None
+
+    def get_materials(self, obj: str) -> list:
+        """
+        Get the materials assigned to the object or its faces
+        :param obj:
+        :return:
+        """
+        if self.assignments is None:
+            self.assignments = tag_utils.get_material_assignments()
+        return self.assignments.get(obj, [])
+
+    def get_all_materials(self) -> set:
+        """
+        Get the names of all the materials in the scene
+        :return:
+        """
+        if self.materials is None:
+            self.materials = set(tag_utils.get_scene_materials())
+        return self.materials
+
+
+class ObjectBlacklist(object):
+    """
+    Objects the editor must not affect such as camera transforms, kept as a set
+    rebuilt only after cameras were created or deleted
+    """
+
+    def __init__(self):
+        self.objects = None
+
+    def invalidate(self) -> None:
+        """
+        Mark the blacklist out of date, it will be rebuilt when next used
+        :return:
+        """
+        self.objects = None
+
+    def get_objects(self) -> set:
+        """
+        Get the blacklisted objects
+        :return:
+        """
+        if self.objects is None:
+            self.objects = set(tag_utils.get_cameras_transform_in_scene())
+        return self.objects
+
+    def filter(self, objects: list) -> list:
+        """
+        Remove the blacklisted objects from the list
+        :param objects:
+        :return:
+        """
+        blacklist = self.get_objects()
+        if not blacklist:
+            return objects
+        return [obj for obj in objects if obj not in blacklist]
+
+
+# Tags snapshots
+#
+# Text snapshots are JSON lines : a header then {"object": name, "tags": [tags]}.
+# Binary snapshots are a zlib stream after SNAPSHOT_MAGIC, made of records
+# b"T" <tag> defining the next tag ID the first time a tag is met and
+# b"O" <object> <count> <tag IDs>, strings and numbers being varint prefixed.
+# Objects without the attribute have None tags, b"N" <object> records.
+
+SNAPSHOT_MAGIC = b"GTS1"
+SNAPSHOT_CHUNK_SIZE = 5000
+
+
+def export_snapshot(
+    path: str, index: TagIndex, objects: list, binary=False, include_untagged=True
+) -> int:
+    """
+    Write the tags of the objects to a snapshot file, chunk by chunk
+    :param path:
+    :param index:
+    :param objects:
+    :param binary: write the compact binary format instead of JSON lines
+    :param include_untagged: also write the objects without the attribute, their
+    tags are None so importing the snapshot clears the tags added since
+    :return: number of objects written
+    """
+    count = 0
+    writer = _BinarySnapshotWriter(path) if binary else _TextSnapshotWriter(path)
+    with writer:
+        for start in range(0, len(objects), SNAPSHOT_CHUNK_SIZE):
+            chunk = objects[start : start + SNAPSHOT_CHUNK_SIZE]
+            index.ensure(chunk)
+            for obj in chunk:
+                if index.has_attribute(obj):
+                    writer.write(obj, index.get_tags(obj))
+                elif include_untagged:
+                    writer.write(obj, None)
+                else:
+                    continue
+                count += 1
+    return count
+
+
+def read_snapshot(path: str):
+    """
+    Yield (object, tags) for every entry of a text or binary snapshot
+    :param path:
+    :return:
+    """
+    with open(path, "rb") as f:
+        is_binary = f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    if is_binary:
+        yield from _read_binary_snapshot(path)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("format") != "GuerillaTags":
+                raise ValueError(f"{path} is not a GuerillaTags snapshot")
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["object"], entry["tags"]
+
+
+def import_snapshot(path: str, index: TagIndex) -> int:
+    """
+    Apply the tags of a snapshot to the objects of the scene, only the objects
+    whose tags differ are written. Objects exported without the attribute have
+    their current tags cleared.
+    :param path:
+    :param index:
+    :return: number of objects written
+    """
+    snapshot = dict(read_snapshot(path))
+    objects = tag_utils.get_existing_objects(list(snapshot))
+    with tag_edit.TagTransaction(index, objects) as transaction:
+        for obj in objects:
+            # The transaction skips the untagged objects that are still untagged
+            transaction.set_tags(obj, snapshot[obj] or [])
+    return len(transaction.changed_objects)
+
+
+def diff_snapshots(old_path: str, new_path: str):
+    """
+    Yield the tags added and removed per object between two snapshots
+    :param old_path:
+    :param new_path:
+    :return: {"object": name, "added": [tags], "removed": [tags]} dicts
+    """
+    old_snapshot = dict(read_snapshot(old_path))
+    for obj, new_tags in read_snapshot(new_path):
+        old_tags = old_snapshot.pop(obj, None) or []
+        new_tags = new_tags or []
+        added_tags = [tag for tag in new_tags if tag not in old_tags]
+        removed_tags = [tag for tag in old_tags if tag not in new_tags]
+        if added_tags or removed_tags:
+            yield {"object": obj, "added": added_tags, "removed": removed_tags}
+    for obj, old_tags in old_snapshot.items():
+        if old_tags:
+            yield {"object": obj, "added": [], "removed": old_tags}
+
+
+class _TextSnapshotWriter(object):
+    def __init__(self, path: str):
+        self.file = open(path, "w", encoding="utf-8")
+        self.file.write(json.dumps({"format": "GuerillaTags", "version": 1}) + "\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()
+
+    def write(self, obj: str, tags: list) -> None:
+        self.file.write(json.dumps({"object": obj, "tags": tags}) + "\n")
+
+
+class _BinarySnapshotWriter(object):
+    def __init__(self, path: str):
+        self.file = open(path, "wb")
+        self.file.write(SNAPSHOT_MAGIC)
+        self.compressor = zlib.compressobj()
+        self.tag_ids = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.write(self.compressor.flush())
+        self.file.close()
+
+    def write(self, obj: str, tags: list) -> None:
+        if tags is None:
+            self.file.write(self.compressor.compress(b"N" + _encode_string(obj)))
+            return
+        record = bytearray()
+        for tag in tags:
+            if tag not in self.tag_ids:
+                self.tag_ids[tag] = len(self.tag_ids)
+                record += b"T" + _encode_string(tag)
+        record += b"O" + _encode_string(obj) + _encode_varint(len(tags))
+        for tag in tags:
+            record += _encode_varint(self.tag_ids[tag])
+        self.file.write(self.compressor.compress(bytes(record)))
+
+
+def _read_binary_snapshot(path: str):
+    with open(path, "rb") as f:
+        f.seek(len(SNAPSHOT_MAGIC))
+        data = zlib.decompress(f.read())
+    tag_names = []
+    position = 0
+    while position < len(data):
+        record_type = data[position : position + 1]
+        position += 1
+        if record_type == b"T":
+            tag, position = _decode_string(data, position)
+            tag_names.append(tag)
+        elif record_type == b"O":
+            obj, position = _decode_string(data, position)
+            count, position = _decode_varint(data, position)
+            tags = []
+            for _ in range(count):
+                tag_id, position = _decode_varint(data, position)
+                tags.append(tag_names[tag_id])
+            yield obj, tags
+        elif record_type == b"N":
+            obj, position = _decode_string(data, position)
+            yield obj, None
+        else:
+            raise ValueError(f"Corrupted GuerillaTags snapshot {path}")
+
+
+def _encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _decode_varint(data: bytes, position: int) -> tuple:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _encode_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return _encode_varint(len(encoded)) + encoded
+
+
+def _decode_string(data: bytes, position: int) -> tuple:
+    length, position = _decode_varint(data, position)
+    return data[position : position + length].decode("utf-8"), position + length
+
+
+class DiskCache(object):
+    """
+    Binary snapshots of the scene index saved in the user cache directory, one per
+    scene path, so the editor fills its index at once before checking it against
+    the live scene
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory
+
+    def get_path(self, scene_path: str) -> str:
+        """
+        Get the cache file of the scene
+        :param scene_path:
+        :return:
+        """
+        if self.directory is None:
+            self.directory = tag_utils.get_cache_directory()
+        scene_key = hashlib.sha1(os.path.normcase(scene_path).encode("utf-8"))
+        return os.path.join(self.directory, scene_key.hexdigest() + ".gts")
+
+    def is_up_to_date(self, scene_files: list, scene_modified: bool) -> bool:
+        """
+        Check whether the cache was written after the scene and its references
+        were last saved, and the scene was not edited since it was opened or saved
+        :param scene_files: scene path followed by the referenced files
+        :param scene_modified: whether the opened scene has unsaved changes
+        :return:
+        """
+        if scene_modified:
+            return False
+        cache_path = self.get_path(scene_files[0])
+        if not os.path.exists(cache_path):
+            return False
+        cache_time = os.path.getmtime(cache_path)
+        return all(
+            os.path.exists(scene_file) and os.path.getmtime(scene_file) <= cache_time
+            for scene_file in scene_files
+        )
+
+    def load(self, scene_path: str, index: TagIndex) -> list:
+        """
+        Fill the index with the cached tags of the scene
+        :param scene_path:
+        :param index:
+        :return: the objects loaded, to check against the scene
+        """
+        cache_path = self.get_path(scene_path)
+        if not os.path.exists(cache_path):
+            return []
+        entries = [
+            (obj, tags or [], tags is not None)
+            for obj, tags in read_snapshot(cache_path)
+            if obj not in index
+        ]
+        index.set_tags_many(entries)
+        return [entry[0] for entry in entries]
+
+    def save(self, scene_path: str, index: TagIndex) -> None:
+        """
+        Write the index of the scene to the cache
+        :param scene_path:
+        :param index:
+        :return:
+        """
+        cache_path = self.get_path(scene_path)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        export_snapshot(
+            cache_path,
+            index,
+            index.get_cached_objects(),
+            binary=True,
+            include_untagged=True,
+        )
+
+
+def verify_objects(index: TagIndex, objects: list, chunk_size=SNAPSHOT_CHUNK_SIZE):
+    """
+    Check cached objects against the scene one chunk at a time, fixing only the
+    entries that changed. Yields the number of objects checked after each chunk.
+    :param index:
+    :param objects:
+    :param chunk_size:
+    :return:
+    """
+    for start in range(0, len(objects), chunk_size):
+        chunk = objects[start : start + chunk_size]
+        existing_objects = tag_utils.get_existing_objects(chunk)
+        index.remove_objects(set(chunk).difference(existing_objects))
+        index.set_tags_many(
+            (obj, parse_gtags(gtags), gtags is not None)
+            for obj, gtags in tag_utils.read_gtags(existing_objects).items()
+        )
+        yield start + len(chunk)
+
+
+SCAN_TIME_BUDGET = 0.03
+SCAN_CHUNK_SIZE = 500
+
+
+def scan_objects(
+    index: TagIndex,
+    objects: list,
+    time_budget=SCAN_TIME_BUDGET,
+    chunk_size=SCAN_CHUNK_SIZE,
+):
+    """
+    Read the objects in the index in slices of about time_budget seconds, to run
+    from the idle loop without freezing Maya. Yields the objects read in each slice.
+    :param index:
+    :param objects:
+    :param time_budget: seconds spent reading before handing control back
+    :param chunk_size: objects read per backend call
+    :return:
+    """
+    position = 0
+    while position < len(objects):
+        start = position
+        deadline = time.perf_counter() + time_budget
+        while position < len(objects) and time.perf_counter() < deadline:
+            index.ensure(objects[position : position + chunk_size])
+            position = min(position + chunk_size, len(objects))
+        yield objects[start:position]
+
+
+# Editor refresh and drop, without the ui so the benchmarks time the same code
+
+
+def get_affected_objects(mode: str, object_blacklist: ObjectBlacklist) -> list:
+    """
+    Get the objects affected by the editor mode, without the blacklisted ones
+    :param mode: "selection", "children" or "all"
+    :param object_blacklist:
+    :return:
+    """
+    return object_blacklist.filter(tag_utils.get_clean_selection(mode))
+
+
+def load_scene_cache(disk_cache: DiskCache, index: TagIndex, scene_path: str):
+    """
+    Fill the index from the disk cache of the scene
+    :param disk_cache:
+    :param index:
+    :param scene_path:
+    :return: (objects loaded, objects to check against the scene with
+    verify_objects, empty when the cache is up to date)
+    """
+    objects = disk_cache.load(scene_path, index)
+    if objects and not disk_cache.is_up_to_date(
+        tag_utils.get_scene_files(), tag_utils.is_scene_modified()
+    ):
+        return objects, objects
+    return objects, []
+
+
+def refresh_selection_tags(
+    selection_tags: SelectionTags, objects: list, progressive=False
+) -> list:
+    """
+    Count the tags of the objects, only the objects added since the last
+    refresh are read
+    :param selection_tags:
+    :param objects:
+    :param progressive: only count the cached objects, the others are returned
+    to be read with scan_selection_tags
+    :return: objects left to scan
+    """
+    if not progressive:
+        selection_tags.update(objects)
+        return []
+    index = selection_tags.index
+    selection_tags.update([obj for obj in objects if obj in index])
+    return [obj for obj in objects if obj not in index]
+
+
+def scan_selection_tags(selection_tags: SelectionTags, objects: list):
+    """
+    Read the objects with scan_objects and add them to the selection slice by
+    slice. Yields the number of objects read in each slice.
+    :param selection_tags:
+    :param objects:
+    :return:
+    """
+    for scanned_objects in scan_objects(selection_tags.index, objects):
+        selection_tags.extend(scanned_objects)
+        yield len(scanned_objects)
+
+
+def get_dropped_tags(
+    index: TagIndex,
+    names: list,
+    mode: str,
+    object_blacklist: ObjectBlacklist,
+    sort_by_frequency=False,
+) -> tuple:
+    """
+    Count the tags of the objects dropped from the outliner, with their
+    descendants in children and Scene modes
+    :param index:
+    :param names: dropped names, one per line of the drop text
+    :param mode: "selection", "children" or "all"
+    :param object_blacklist:
+    :param sort_by_frequency: order the tags from the most to the least carried,
+    equally frequent tags keep their first-seen order
+    :return: (objects, {tag: count})
+    """
+    objects = tag_utils.get_existing_transforms(
+        [name.strip() for name in names if name.strip()]
+    )
+    if mode in ("children", "all"):
+        objects = tag_utils.expand_hierarchy(objects)
+    objects = object_blacklist.filter(objects)
+    tag_counts = index.get_tag_counts_on_objects(objects)
+    if sort_by_frequency:
+        tag_counts = dict(
+            sorted(tag_counts.items(), key=lambda item: item[1], reverse=True)
+        )
+    return objects, tag_counts
+
+
+if __name__ == "__main__":
+    # python tag_caching.py diff old_snapshot new_snapshot
+    if len(sys.argv) != 4 or sys.argv[1] != "diff":
+        sys.exit("usage : python tag_caching.py diff old_snapshot new_snapshot")
+    for difference in diff_snapshots(sys.argv[2], sys.argv[3]):
+        sys.stdout.write(json.dumps(difference) + "\n")
@@ -0,0 +1,436 @@
+try:
+    import maya.api.OpenMaya as om
+except ImportError:
+    om = None
+
+import tag_utils
+import tag_caching
+
+# Module related to the Maya callbacks keeping the tags cache coherent
+
+# Number of attribute changed callbacks registered per idle event
+WATCH_CHUNK_SIZE = 500
+
+
+class SceneWatcher(object):
+    """
+    Register node and DAG message callbacks updating the TagIndex in place when
+    GuerillaTags are edited outside of the editor, nodes are added, removed or
+    renamed, and clearing it when another scene is opened. Imported and
+    referenced nodes are merged in the cache instead.
+    """
+
+    def __init__(
+        self,
+        index: tag_caching.TagIndex,
+        on_change=None,
+        material_cache=None,
+        object_blacklist=None,
+    ):
+        """
+        :param index:
+        :param on_change: callable run after the scene changed, e.g. a ui refresh
+        :param material_cache: tag_caching.MaterialCache invalidated when the
+        shading assignments change or materials are created, deleted or renamed
+        :param object_blacklist: tag_caching.ObjectBlacklist invalidated when
+        cameras are created, deleted, renamed or reparented
+        """
+        self.index = index
+        self.on_change = on_change
+        self.material_cache = material_cache
+        self.object_blacklist = object_blacklist
+        self.callback_ids = []
+        # object -> attribute changed callback id of the cached objects
+        self.node_callbacks = {}
+        # MObjectHandle hash code <-> name of the watched objects, to find the
+        # cached entry of a node after its shortest unique name changed
+        self.watched_nodes = {}
+        self.node_hashes = {}
+        # Cached objects waiting for their attribute changed callback, registered
+        # in chunks from the idle event instead of inside the index update
+        self.pending_objects = {}
+        self.idle_callback_id = None
+        # MObjectHandle of the transforms created by the running import or
+        # reference load
+        self.merged_nodes = None
+
+    def start(self) -> None:
+        """
+        Register the callbacks and watch the objects already cached
+        :return:
+        """
+        if om is None or self.callback_ids:
+            return
+        self.callback_ids.append(
+            om.MDGMessage.addNodeAddedCallback(self.on_node_added, "transform")
+        )
+        self.callback_ids.append(
+            om.MDGMessage.addNodeRemovedCallback(self.on_node_removed, "transform")
+        )
+        self.callback_ids.append(
+            om.MNodeMessage.addNameChangedCallback(
+                om.MObject.kNullObj, self.on_name_changed
+            )
+        )
+        # Reparenting changes the shortest unique name of a subtree
+        self.callback_ids.append(
+            om.MDagMessage.addParentAddedCallback(self.on_parent_changed)
+        )
+        self.callback_ids.append(
+            om.MDagMessage.addParentRemovedCallback(self.on_parent_changed)
+        )
+        if self.material_cache is not None:
+            self.callback_ids.append(
+                om.MDGMessage.addConnectionCallback(self.on_connection_changed)
+            )
+            self.callback_ids.append(
+                om.MDGMessage.addNodeRemovedCallback(
+                    self.on_shading_engine_removed, "shadingEngine"
+                )
+            )
+            # Materials have no common node type, they are told apart by their
+            # classification
+            self.callback_ids.append(
+                om.MDGMessage.addNodeAddedCallback(self.on_shading_node_changed)
+            )
+            self.callback_ids.append(
+                om.MDGMessage.addNodeRemovedCallback(self.on_shading_node_changed)
+            )
+        if self.object_blacklist is not None:
+            self.callback_ids.append(
+                om.MDGMessage.addNodeAddedCallback(self.on_camera_changed, "camera")
+            )
+            self.callback_ids.append(
+                om.MDGMessage.addNodeRemovedCallback(self.on_camera_changed, "camera")
+            )
+        for message in (om.MSceneMessage.kAfterNew, om.MSceneMessage.kAfterOpen):
+            self.callback_ids.append(
+                om.MSceneMessage.addCallback(message, self.on_scene_changed)
+            )
+        for message in (
+            om.MSceneMessage.kBeforeImport,
+            om.MSceneMessage.kBeforeCreateReference,
+            om.MSceneMessage.kBeforeLoadReference,
+        ):
+            self.callback_ids.append(
+                om.MSceneMessage.addCallback(message, self.on_scene_merge_started)
+            )
+        for message in (
+            om.MSceneMessage.kAfterImport,
+            om.MSceneMessage.kAfterCreateReference,
+            om.MSceneMessage.kAfterLoadReference,
+            om.MSceneMessage.kAfterUnloadReference,
+            om.MSceneMessage.kAfterRemoveReference,
+        ):
+            self.callback_ids.append(
+                om.MSceneMessage.addCallback(message, self.on_scene_merged)
+            )
+        self.index.listeners.append(self.on_index_changed)
+        for obj in self.index.get_cached_objects():
+            self.queue_watch(obj)
+
+    def stop(self) -> None:
+        """
+        Remove every callback registered by the watcher
+        :return:
+        """
+        if self.on_index_changed in self.index.listeners:
+            self.index.listeners.remove(self.on_index_changed)
+        if self.callback_ids:
+            om.MMessage.removeCallbacks(self.callback_ids)
+        self.callback_ids = []
+        self.merged_nodes = None
+        self.unwatch_all()
+
+    def queue_watch(self, obj: str) -> None:
+        """
+        Watch the object from the next idle events, a bulk read of thousands of
+        objects does not register their callbacks synchronously
+        :param obj:
+        :return:
+        """
+        self.pending_objects[obj] = None
+        if self.idle_callback_id is None:
+            self.idle_callback_id = om.MEventMessage.addEventCallback(
+                "idle", self.on_idle
+            )
+
+    def watch_pending(self, chunk_size=WATCH_CHUNK_SIZE) -> None:
+        """
+        Watch the next chunk of queued objects, the idle callback is removed
+        once the queue is empty
+        :param chunk_size:
+        :return:
+        """
+        for _ in range(min(chunk_size, len(self.pending_objects))):
+            obj = next(iter(self.pending_objects))
+            del self.pending_objects[obj]
+            if obj in self.index and obj not in self.node_callbacks:
+                self.watch(obj)
+        if not self.pending_objects:
+            self._remove_idle_callback()
+
+    def watch(self, obj: str) -> None:
+        """
+        Listen to the attribute changes of a cached object
+        :param obj:
+        :return:
+        """
+        selection_list = om.MSelectionList()
+        try:
+            selection_list.add(obj)
+        except RuntimeError:
+            return
+        node = selection_list.getDependNode(0)
+        self.node_callbacks[obj] = om.MNodeMessage.addAttributeChangedCallback(
+            node, self.on_attribute_changed
+        )
+        handle_hash = om.MObjectHandle(node).hashCode()
+        self.watched_nodes[handle_hash] = obj
+        self.node_hashes[obj] = handle_hash
+
+    def unwatch(self, obj: str) -> None:
+        self.pending_objects.pop(obj, None)
+        callback_id = self.node_callbacks.pop(obj, None)
+        if callback_id is not None:
+            om.MMessage.removeCallback(callback_id)
+        handle_hash = self.node_hashes.pop(obj, None)
+        if self.watched_nodes.get(handle_hash) == obj:
+            del self.watched_nodes[handle_hash]
+
+    def unwatch_all(self) -> None:
+        self.pending_objects.clear()
+        self._remove_idle_callback()
+        if self.node_callbacks:
+            om.MMessage.removeCallbacks(list(self.node_callbacks.values()))
+        self.node_callbacks.clear()
+        self.watched_nodes.clear()
+        self.node_hashes.clear()
+
+    def get_cached_name(self, node) -> str:
+        """
+        Get the name the node is cached under, its current name if not watched
+        :param node: MObject
+        :return:
+        """
+        obj = self.watched_nodes.get(om.MObjectHandle(node).hashCode())
+        return _node_name(node) if obj is None else obj
+
+    def rekey_hierarchy(self, node) -> bool:
+        """
+        Move the cached entries of a transform and of its descendants to their
+        current names, after a rename or a reparent changed their shortest
+        unique name
+        :param node: MObject of the transform
+        :return: whether cached entries were moved
+        """
+        renamed_objects = []
+        iterator = om.MItDag()
+        iterator.reset(node, om.MItDag.kDepthFirst, om.MFn.kTransform)
+        while not iterator.isDone():
+            current_node = iterator.currentItem()
+            iterator.next()
+            old_name = self.watched_nodes.get(om.MObjectHandle(current_node).hashCode())
+            if old_name is None:
+                continue
+            try:
+                new_name = _node_name(current_node)
+            except RuntimeError:
+                # Between the removal from its parent and the new parenting
+                continue
+            if new_name != old_name and old_name in self.index:
+                renamed_objects.append((old_name, new_name))
+        # Every old entry is removed first, a new name may be the old name of
+        # another node of the subtree
+        moved_entries = []
+        for old_name, new_name in renamed_objects:
+            moved_entries.append(
+                (
+                    new_name,
+                    self.index.get_tags(old_name),
+                    self.index.has_attribute(old_name),
+                )
+            )
+            self.index.remove_object(old_name)
+        for new_name, tags, has_attribute in moved_entries:
+            self.index.set_tags(new_name, tags, has_attribute)
+        return bool(renamed_objects)
+
+    def on_index_changed(self, obj: str, old_tags: list, new_tags: list) -> None:
+        if obj is None:
+            self.unwatch_all()
+        elif obj in self.index:
+            if obj not in self.node_callbacks:
+                self.queue_watch(obj)
+        else:
+            self.unwatch(obj)
+
+    def on_idle(self, client_data):
+        self.watch_pending()
+
+    def on_attribute_changed(self, message, plug, other_plug, client_data):
+        if plug.partialName(useLongNames=True) != tag_utils.GTAGS_ATTRIBUTE:
+            return
+        obj = self.get_cached_name(plug.node())
+        if obj not in self.index:
+            return
+        if message & om.MNodeMessage.kAttributeRemoved:
+            self.index.set_tags(obj, [], has_attribute=False)
+        elif message & (
+            om.MNodeMessage.kAttributeSet | om.MNodeMessage.kAttributeAdded
+        ):
+            self.index.set_tags(obj, tag_caching.parse_gtags(plug.asString()))
+        else:
+            return
+        self._changed()
+
+    def on_node_added(self, node, client_data):
+        if self.merged_nodes is not None:
+            self.merged_nodes.append(om.MObjectHandle(node))
+        self._changed()
+
+    def on_node_removed(self, node, client_data):
+        self.index.remove_object(self.get_cached_name(node))
+        self._changed()
+
+    def on_name_changed(self, node, previous_name, client_data):
+        if not previous_name:
+            return
+        if self.material_cache is not None and _is_shading_node(node):
+            # The material cache holds the shadingEngines and materials by name
+            self.material_cache.invalidate()
+            return
+        if not node.hasFn(om.MFn.kTransform):
+            return
+        self._check_camera(node)
+        # The names of the descendants change with the name of their parent
+        if self.rekey_hierarchy(node):
+            self._changed()
+
+    def on_parent_changed(self, child, parent, client_data):
+        node = child.node()
+        if not node.hasFn(om.MFn.kTransform):
+            return
+        self._check_camera(node)
+        if self.rekey_hierarchy(node):
+            self._changed()
+
+    def on_connection_changed(self, plug, other_plug, made, client_data):
+        if plug.node().hasFn(om.MFn.kShadingEngine) or other_plug.node().hasFn(
+            om.MFn.kShadingEngine
+        ):
+            self.material_cache.invalidate()
+
+    def on_shading_engine_removed(self, node, client_data):
+        self.material_cache.invalidate()
+
+    def on_shading_node_changed(self, node, client_data):
+        if _is_material(node):
+            self.material_cache.invalidate()
+
+    def on_camera_changed(self, node, client_data):
+        self.object_blacklist.invalidate()
+
+    def on_scene_changed(self, client_data):
+        self.merged_nodes = None
+        self.index.clear()
+        self._invalidate_scene_caches()
+        self._changed()
+
+    def on_scene_merge_started(self, client_data):
+        self.merged_nodes = []
+
+    def on_scene_merged(self, client_data):
+        """
+        Update the cache after an import or a reference change instead of
+        clearing it : the cached objects that no longer exist under their name
+        are dropped, and the transforms created by the merge are read
+        :return:
+        """
+        merged_nodes = self.merged_nodes or []
+        self.merged_nodes = None
+        cached_objects = self.index.get_cached_objects()
+        self.index.remove_objects(
+            set(cached_objects).difference(
+                tag_utils.get_existing_objects(cached_objects)
+            )
+        )
+        self.index.ensure(
+            [
+                _node_name(handle.object())
+                for handle in merged_nodes
+                if handle.isValid() and handle.object().hasFn(om.MFn.kTransform)
+            ]
+        )
+        self._invalidate_scene_caches()
+        self._changed()
+
+    def _invalidate_scene_caches(self) -> None:
+        if self.material_cache is not None:
+            self.material_cache.invalidate()
+        if self.object_blacklist is not None:
+            self.object_blacklist.invalidate()
+
+    def _remove_idle_callback(self) -> None:
+        if self.idle_callback_id is not None:
+            om.MMessage.removeCallback(self.idle_callback_id)
+            self.idle_callback_id = None
+
+    def _check_camera(self, node) -> None:
+        # The blacklist holds the camera transforms by name
+        if self.object_blacklist is not None and _has_camera_shape(node):
+            self.object_blacklist.invalidate()
+
+    def _changed(self) -> None:
+        if self.on_change is not None:
+            self.on_change()
+
+
+def _node_name(node) -> str:
+    """
+    Get the name of the node as returned by cmds.ls, the shortest unique path
+    :param node: MObject
+    :return:
+    """
+    if node.hasFn(om.MFn.kDagNode):
+        return om.MDagPath.getAPathTo(node).partialPathName()
+    return om.MFnDependencyNode(node).name()
+
+
+def _is_material(node) -> bool:
+    """
+    Check whether the node is a material, as listed by cmds.ls(materials=True)
+    :param node: MObject
+    :return:
+    """
+    if node.hasFn(om.MFn.kDagNode):
+        return False
+    classifications = om.MFnDependencyNode.classification(
+        om.MFnDependencyNode(node).typeName
+    )
+    return any(
+        classification.startswith("shader/")
+        for classification in classifications.split(":")
+    )
+
+
+def _is_shading_node(node) -> bool:
+    """
+    Check whether the node is a shadingEngine or a material
+    :param node: MObject
+    :return:
+    """
+    return node.hasFn(om.MFn.kShadingEngine) or _is_material(node)
+
+
+def _has_camera_shape(node) -> bool:
+    """
+    Check whether the transform has a camera shape
+    :param node: MObject
+    :return:
+    """
+    dag_node = om.MFnDagNode(node)
+    return any(
+        dag_node.child(child_index).hasFn(om.MFn.kCamera)
+        for child_index in range(dag_node.childCount())
+    )
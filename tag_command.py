@@ -0,0 +1,115 @@
+import maya.api.OpenMaya as om
+
+import tag_utils
+
+# Maya plugin registering the guerillaTagsEdit command, loaded by
+# tag_utils.load_edit_command. One run of the command writes the values staged
+# with tag_utils.stage_edit and is one entry of the undo queue, whatever the
+# number of objects.
+
+
+def maya_useNewAPI():
+    pass
+
+
+class TagDiff(object):
+    """
+    Before and after GuerillaTags of the nodes changed by one edit. Tags are
+    stored as tuples of IDs of a tag table shared by the whole diff, values that
+    would not be rebuilt exactly from their tags are kept as strings.
+    """
+
+    def __init__(self):
+        self.tag_ids = {}
+        self.tag_names = []
+        self.nodes = []
+        self.before = []
+        self.after = []
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def add(self, node, before, after: str) -> None:
+        """
+        Record the change of one node
+        :param node: MObject
+        :param before: string or None if the node had no attribute
+        :param after:
+        :return:
+        """
+        self.nodes.append(om.MObjectHandle(node))
+        self.before.append(self.encode(before))
+        self.after.append(self.encode(after))
+
+    def encode(self, gtags):
+        if gtags is None:
+            return None
+        tags = gtags.split(", ") if gtags else []
+        if not all(tags) or ", ".join(tags) != gtags:
+            return gtags
+        return tuple(self.intern_tag(tag) for tag in tags)
+
+    def decode(self, value):
+        if value is None or isinstance(value, str):
+            return value
+        return ", ".join(self.tag_names[tag_id] for tag_id in value)
+
+    def intern_tag(self, tag: str) -> int:
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self.tag_names)
+            self.tag_ids[tag] = tag_id
+            self.tag_names.append(tag)
+        return tag_id
+
+    def apply(self, values: list) -> None:
+        """
+        Write the before or after values to the nodes still alive
+        :param values: self.before or self.after
+        :return:
+        """
+        tag_utils.write_gtags_on_nodes(
+            [
+                (handle.object(), self.decode(value))
+                for handle, value in zip(self.nodes, values)
+                if handle.isValid()
+            ]
+        )
+
+
+class GuerillaTagsEditCommand(om.MPxCommand):
+    def __init__(self):
+        super(GuerillaTagsEditCommand, self).__init__()
+        self.diff = None
+
+    @staticmethod
+    def creator():
+        return GuerillaTagsEditCommand()
+
+    def isUndoable(self):
+        return bool(self.diff)
+
+    def doIt(self, args):
+        values = tag_utils.take_staged_edit()
+        self.diff = TagDiff()
+        for obj, node in tag_utils.iter_dependency_nodes(values):
+            before = tag_utils.read_gtags_on_node(node)
+            if before != values[obj]:
+                self.diff.add(node, before, values[obj])
+        self.redoIt()
+
+    def redoIt(self):
+        self.diff.apply(self.diff.after)
+
+    def undoIt(self):
+        self.diff.apply(self.diff.before)
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, "GuerillaTagsEditor").registerCommand(
+        tag_utils.EDIT_COMMAND, GuerillaTagsEditCommand.creator
+    )
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(tag_utils.EDIT_COMMAND)
@@ -0,0 +1,273 @@
+import json
+import os
+
+import path_utils
+import tag_utils
+
+# Module related to batched edits of the GuerillaTags
+
+SUBDIV_TAGS = ["s0", "s01", "s02", "s03", "s04"]
+# JSON list of the exclusive groups : [{"name": "LOD", "tags": ["lod0", "lod1"]}]
+GROUPS_CONFIG = "tag_groups.json"
+
+
+class TagTransaction(object):
+    """
+    Work out the final tags of each object in memory, then commit exactly one
+    write per changed object in a single undo chunk.
+    Used as a context manager, the transaction commits when the block ends.
+    """
+
+    def __init__(self, index, objects: list = ()):
+        """
+        :param index: tag_caching.TagIndex read and updated by the transaction
+        :param objects: objects that will be edited, read in one pass
+        """
+        self.index = index
+        self.pending = {}
+        self.changed_objects = []
+        index.ensure(objects)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        return False
+
+    def get_tags(self, obj: str) -> list:
+        """
+        Get the tags of the object as they will be committed
+        :param obj:
+        :return:
+        """
+        if obj in self.pending:
+            return list(self.pending[obj])
+        self.index.ensure([obj])
+        return self.index.get_tags(obj)
+
+    def set_tags(self, obj: str, tags: list) -> None:
+        """
+        Replace the tags of the object
+        :param obj:
+        :param tags:
+        :return:
+        """
+        self.pending[obj] = [tag for tag in dict.fromkeys(tags) if tag]
+
+    def add_tags(self, obj: str, tags: list) -> None:
+        """
+        Add the tags missing on the object at the end of its tags
+        :param obj:
+        :param tags:
+        :return:
+        """
+        self.set_tags(obj, self.get_tags(obj) + list(tags))
+
+    def remove_tags(self, obj: str, tags) -> None:
+        """
+        Remove the tags from the object
+        :param obj:
+        :param tags:
+        :return:
+        """
+        self.set_tags(obj, [tag for tag in self.get_tags(obj) if tag not in tags])
+
+    def commit(self) -> int:
+        """
+        Write the objects whose tags changed and update the index
+        :return: number of objects written
+        """
+        changes = {}
+        missing_attribute = set()
+        for obj, tags in self.pending.items():
+            has_attribute = self.index.has_attribute(obj)
+            if tags == self.index.get_tags(obj) and (has_attribute or not tags):
+                continue
+            changes[obj] = tag_utils.convert_gtags_in_string(tags)
+            if not has_attribute:
+                missing_attribute.add(obj)
+        tag_utils.write_gtags_undoable(changes, missing_attribute)
+        self.index.set_tags_many((obj, self.pending[obj], True) for obj in changes)
+        self.changed_objects = list(changes)
+        self.pending.clear()
+        return len(changes)
+
+
+# Edits shared by the editor actions
+
+
+def add_tags(index, objects: list, tags: list) -> int:
+    """
+    Add the tags to every object
+    :param index:
+    :param objects:
+    :param tags:
+    :return: number of objects written
+    """
+    index.ensure(objects)
+    mask = index.get_mask(objects)
+    lacking_mask = 0
+    for tag in tags:
+        if tag:
+            lacking_mask |= mask & ~index.get_tag_mask(tag)
+    with TagTransaction(index) as transaction:
+        for obj in index.get_objects_from_mask(lacking_mask):
+            transaction.add_tags(obj, tags)
+    return len(transaction.changed_objects)
+
+
+def remove_tags(index, objects: list, tags: list) -> int:
+    """
+    Remove the tags from every object
+    :param index:
+    :param objects:
+    :param tags:
+    :return: number of objects written
+    """
+    index.ensure(objects)
+    tagged_objects = index.get_objects_with_any(tags, index.get_mask(objects))
+    tags = set(tags)
+    with TagTransaction(index) as transaction:
+        for obj in tagged_objects:
+            transaction.remove_tags(obj, tags)
+    return len(transaction.changed_objects)
+
+
+def replace_tags(index, objects: list, old_tags: list, new_tags: list) -> int:
+    """
+    Replace the old tags by the new ones on the objects carrying any old tag
+    :param index:
+    :param objects:
+    :param old_tags:
+    :param new_tags:
+    :return: number of objects written
+    """
+    index.ensure(objects)
+    tagged_objects = index.get_objects_with_any(old_tags, index.get_mask(objects))
+    old_tags = set(old_tags)
+    with TagTransaction(index) as transaction:
+        for obj in tagged_objects:
+            obj_tags = transaction.get_tags(obj)
+            kept_tags = [tag for tag in obj_tags if tag not in old_tags]
+            transaction.set_tags(obj, kept_tags + list(new_tags))
+    return len(transaction.changed_objects)
+
+
+def merge_tags(index, objects: list, old_tags: list, new_tag: str) -> int:
+    """
+    Rename the old tags to the new tag, in place of the first old tag of each
+    object. Only the objects carrying an old tag are read and written.
+    :param index:
+    :param objects:
+    :param old_tags: one tag to rename it, several to merge them
+    :param new_tag:
+    :return: number of objects written
+    """
+    index.ensure(objects)
+    tagged_objects = index.get_objects_with_any(old_tags, index.get_mask(objects))
+    old_tags = set(old_tags)
+    with TagTransaction(index) as transaction:
+        for obj in tagged_objects:
+            obj_tags = transaction.get_tags(obj)
+            transaction.set_tags(
+                obj, [new_tag if tag in old_tags else tag for tag in obj_tags]
+            )
+    return len(transaction.changed_objects)
+
+
+class ExclusiveGroup(object):
+    """
+    Tags of which an object carries at most one, e.g. the subdivision levels
+    """
+
+    def __init__(self, name: str, tags: list):
+        self.name = name
+        self.tags = list(tags)
+        self.tag_set = frozenset(self.tags)
+
+
+def load_exclusive_groups(path: str = None) -> list:
+    """
+    Load the exclusive groups of a JSON config file
+    :param path: the tag_groups.json file of the editor if None, the subdivision
+    group alone when that file does not exist
+    :return:
+    """
+    if path is None:
+        path = path_utils.get_abspath(GROUPS_CONFIG)
+        if not os.path.exists(path):
+            return [ExclusiveGroup("Subdivision", SUBDIV_TAGS)]
+    with open(path, "r") as f:
+        config = json.load(f)
+    return [ExclusiveGroup(group["name"], group["tags"]) for group in config]
+
+
+def set_exclusive_tags(index, objects: list, tags: list, groups: list) -> int:
+    """
+    Set the tags on the objects and remove the other tags of their groups. Only
+    the objects missing a tag or carrying a sibling are read and written, once.
+    :param index:
+    :param objects:
+    :param tags: when several tags belong to the same group the last one is set
+    :param groups: ExclusiveGroup list
+    :return: number of objects written
+    """
+    group_of_tag = {tag: group for group in groups for tag in group.tag_set}
+    chosen_tags = {}
+    for tag in tags:
+        group = group_of_tag.get(tag)
+        chosen_tags[group.name if group else tag] = tag
+    index.ensure(objects)
+    mask = index.get_mask(objects)
+    touched_mask = 0
+    removed_tags = set()
+    for tag in chosen_tags.values():
+        touched_mask |= mask & ~index.get_tag_mask(tag)
+        group = group_of_tag.get(tag)
+        if group is not None:
+            for sibling in group.tag_set.difference([tag]):
+                touched_mask |= mask & index.get_tag_mask(sibling)
+                removed_tags.add(sibling)
+    tags = list(chosen_tags.values())
+    with TagTransaction(index) as transaction:
+        for obj in index.get_objects_from_mask(touched_mask):
+            obj_tags = transaction.get_tags(obj)
+            kept_tags = [tag for tag in obj_tags if tag not in removed_tags]
+            transaction.set_tags(obj, kept_tags + tags)
+    return len(transaction.changed_objects)
+
+
+def set_exclusive_tag(index, objects: list, tag: str, exclusive_tags: list) -> int:
+    """
+    Set the tag on the objects and remove the other tags of its exclusive group
+    :param index:
+    :param objects:
+    :param tag:
+    :param exclusive_tags:
+    :return: number of objects written
+    """
+    return set_exclusive_tags(
+        index, objects, [tag], [ExclusiveGroup("", exclusive_tags)]
+    )
+
+
+def tag_materials(index, objects: list, material_cache) -> int:
+    """
+    Tag the objects with the names of their materials and remove the names of
+    the materials that are not assigned to them anymore
+    :param index:
+    :param objects:
+    :param material_cache: tag_caching.MaterialCache
+    :return: number of objects written
+    """
+    all_materials = material_cache.get_all_materials()
+    with TagTransaction(index, objects) as transaction:
+        for obj in objects:
+            materials = material_cache.get_materials(obj)
+            if not materials:
+                continue
+            transaction.remove_tags(obj, all_materials.difference(materials))
+            transaction.add_tags(obj, materials)
+    return len(transaction.changed_objects)
@@ -0,0 +1,141 @@
+import tag_utils
+import tag_caching
+
+# Module related to the checks and fixes of the GuerillaTags attribute strings
+#
+# duplicate       a tag is written several times
+# empty           empty entries, e.g. "smooth,, s02" or a trailing comma
+# separator       tags not separated by exactly ", " or surrounded by spaces
+# stale_material  tag named after a material that is not assigned to the object
+# camera          tags on a blacklisted camera transform
+
+LINT_ISSUES = ("duplicate", "empty", "separator", "stale_material", "camera")
+
+
+def lint_gtags(gtags: str, materials=(), assigned_materials=(), is_camera=False):
+    """
+    Check one attribute string
+    :param gtags:
+    :param materials: names of every material of the scene
+    :param assigned_materials: materials assigned to the object
+    :param is_camera: whether the object is a blacklisted camera
+    :return: (issues, fixed attribute string)
+    """
+    entries = [entry.strip() for entry in gtags.split(",")]
+    tags = [entry for entry in entries if entry]
+    issues = []
+    if len(set(tags)) < len(tags):
+        issues.append("duplicate")
+    if len(tags) < len(entries) and gtags.strip():
+        issues.append("empty")
+    if gtags != ", ".join(entries):
+        issues.append("separator")
+    stale_tags = {
+        tag for tag in tags if tag in materials and tag not in assigned_materials
+    }
+    if stale_tags:
+        issues.append("stale_material")
+    if is_camera and tags:
+        issues.append("camera")
+        return issues, ""
+    fixed_tags = [tag for tag in tags if tag not in stale_tags]
+    return issues, tag_utils.convert_gtags_in_string(fixed_tags)
+
+
+def lint_objects(
+    objects: list,
+    material_cache=None,
+    object_blacklist=None,
+    chunk_size=tag_caching.SNAPSHOT_CHUNK_SIZE,
+):
+    """
+    Read and check the attribute of the objects one chunk at a time. Yields the
+    entries of each chunk, only for the objects having issues.
+    :param objects:
+    :param material_cache: tag_caching.MaterialCache, created if None
+    :param object_blacklist: tag_caching.ObjectBlacklist, created if None
+    :param chunk_size:
+    :return: {"object": name, "gtags": string, "issues": [issues], "fix": string}
+    """
+    if material_cache is None:
+        material_cache = tag_caching.MaterialCache()
+    if object_blacklist is None:
+        object_blacklist = tag_caching.ObjectBlacklist()
+    materials = material_cache.get_all_materials()
+    cameras = object_blacklist.get_objects()
+    for start in range(0, len(objects), chunk_size):
+        entries = []
+        values = tag_utils.read_gtags(objects[start : start + chunk_size])
+        for obj, gtags in values.items():
+            if not gtags:
+                continue
+            issues, fixed_gtags = lint_gtags(
+                gtags, materials, material_cache.get_materials(obj), obj in cameras
+            )
+            if issues:
+                entries.append(
+                    {
+                        "object": obj,
+                        "gtags": gtags,
+                        "issues": issues,
+                        "fix": fixed_gtags,
+                    }
+                )
+        yield entries
+
+
+def run_lint(
+    objects: list = None,
+    material_cache=None,
+    object_blacklist=None,
+    fix=False,
+    index=None,
+) -> dict:
+    """
+    Lint the objects and write the fixed strings in one batched undoable commit
+    :param objects: every transform of the scene if None, cameras included
+    :param material_cache:
+    :param object_blacklist:
+    :param fix: write the fixed strings
+    :param index: tag_caching.TagIndex updated with the fixed tags
+    :return: report {"objects": checked, "issues": {issue: count},
+    "entries": [entries], "fixed": objects written}
+    """
+    if objects is None:
+        objects = tag_utils.get_clean_selection("all")
+    report = {
+        "objects": len(objects),
+        "issues": dict.fromkeys(LINT_ISSUES, 0),
+        "entries": [],
+        "fixed": 0,
+    }
+    for entries in lint_objects(objects, material_cache, object_blacklist):
+        for entry in entries:
+            for issue in entry["issues"]:
+                report["issues"][issue] += 1
+        report["entries"].extend(entries)
+    if fix:
+        report["fixed"] = apply_lint_fixes(report, index)
+    return report
+
+
+def apply_lint_fixes(report: dict, index=None) -> int:
+    """
+    Write the fixed strings of a lint report in one batched undoable commit
+    :param report: report of run_lint
+    :param index: tag_caching.TagIndex updated with the fixed tags
+    :return: number of objects written
+    """
+    changes = {
+        entry["object"]: entry["fix"]
+        for entry in report["entries"]
+        if entry["fix"] != entry["gtags"]
+    }
+    tag_utils.write_gtags_undoable(changes)
+    if index is not None:
+        index.set_tags_many(
+            (obj, tag_caching.parse_gtags(gtags), True)
+            for obj, gtags in changes.items()
+            if obj in index
+        )
+    return len(changes)
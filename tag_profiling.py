@@ -0,0 +1,204 @@
+import collections
+import contextlib
+import time
+
+import tag_utils
+
+# Module related to the profiling of the Maya calls made by the editor
+
+
+class ActionReport(object):
+    """
+    Cost of one editor action : wall time, Maya calls by command and time spent
+    in the phases of the action
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.command_counts = collections.Counter()
+        self.command_times = collections.Counter()
+        self.phase_times = collections.Counter()
+
+    def get_maya_time(self) -> float:
+        return sum(self.command_times.values())
+
+    def format(self, limit: int = 5) -> str:
+        """
+        Get a one line summary of the report, the costliest commands first
+        :param limit: number of commands and phases detailed
+        :return:
+        """
+        commands = sorted(self.command_times, key=self.command_times.get, reverse=True)
+        phases = sorted(self.phase_times, key=self.phase_times.get, reverse=True)
+        summary = (
+            f"{self.name} : {self.seconds * 1000:.1f} ms,"
+            f" {sum(self.command_counts.values())} Maya calls"
+            f" ({self.get_maya_time() * 1000:.1f} ms)"
+        )
+        if phases:
+            summary += " | " + ", ".join(
+                f"{phase} {self.phase_times[phase] * 1000:.1f} ms"
+                for phase in phases[:limit]
+            )
+        if commands:
+            summary += " | " + ", ".join(
+                f"{command} x{self.command_counts[command]}"
+                f" {self.command_times[command] * 1000:.1f} ms"
+                for command in commands[:limit]
+            )
+        return summary
+
+
+class MayaProfiler(object):
+    """
+    Counts and times the Maya calls of the profiled modules while enabled.
+    Calls are grouped per editor action, nested actions count in the outer one.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.modules = []
+        self.backend = None
+        self.last_report = None
+        self.current_report = None
+        self.depth = 0
+        # Callables receiving the ActionReport of every finished action
+        self.listeners = []
+
+    def enable(self, modules: list) -> None:
+        """
+        Route the maya.cmds calls of the modules and the GuerillaTags backend
+        through the profiler
+        :param modules: modules calling maya through their cmds attribute
+        :return:
+        """
+        if self.enabled:
+            return
+        self.modules = [module for module in modules if hasattr(module, "cmds")]
+        for module in self.modules:
+            module.cmds = _ProfiledCommands(module.cmds, self)
+        self.backend = tag_utils.get_backend()
+        tag_utils.set_backend(_ProfiledBackend(self.backend, self))
+        self.enabled = True
+
+    def disable(self) -> None:
+        """
+        Give the modules their maya.cmds and backend back
+        :return:
+        """
+        if not self.enabled:
+            return
+        for module in self.modules:
+            module.cmds = module.cmds.commands
+        tag_utils.set_backend(self.backend)
+        self.modules = []
+        self.backend = None
+        self.enabled = False
+
+    @contextlib.contextmanager
+    def action(self, name: str):
+        """
+        Profile the calls made in the context as one editor action
+        :param name:
+        :return:
+        """
+        if not self.enabled or self.depth:
+            self.depth += 1
+            try:
+                yield
+            finally:
+                self.depth -= 1
+            return
+        self.current_report = ActionReport(name)
+        self.depth = 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            report = self.current_report
+            report.seconds = time.perf_counter() - start
+            self.current_report = None
+            self.depth = 0
+            self.last_report = report
+            for listener in self.listeners:
+                listener(report)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Time a part of the current action, e.g. the selection expansion
+        :param name:
+        :return:
+        """
+        if self.current_report is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current_report.phase_times[name] += time.perf_counter() - start
+
+    def record(self, command: str, seconds: float) -> None:
+        if self.current_report is not None:
+            self.current_report.command_counts[command] += 1
+            self.current_report.command_times[command] += seconds
+
+
+class _ProfiledCommands(object):
+    """
+    Stand-in for the maya.cmds module timing every command
+    """
+
+    def __init__(self, commands, profiler: MayaProfiler):
+        self.commands = commands
+        self.profiler = profiler
+
+    def __getattr__(self, name: str):
+        command = getattr(self.commands, name)
+        if not callable(command):
+            return command
+        profiler = self.profiler
+
+        def profiled_command(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return command(*args, **kwargs)
+            finally:
+                profiler.record(name, time.perf_counter() - start)
+
+        return profiled_command
+
+
+class _ProfiledBackend(tag_utils.GtagsBackend):
+    """
+    GuerillaTags backend timing the bulk reads and writes of the wrapped one
+    """
+
+    def __init__(self, backend: tag_utils.GtagsBackend, profiler: MayaProfiler):
+        self.backend = backend
+        self.profiler = profiler
+
+    def read(self, objects: list) -> dict:
+        with self.profiler.phase("attribute reads"):
+            return self.backend.read(objects)
+
+    def write(self, values: dict) -> None:
+        with self.profiler.phase("attribute writes"):
+            self.backend.write(values)
+
+    def write_undoable(self, values: dict, missing_attribute=None) -> None:
+        with self.profiler.phase("attribute writes"):
+            self.backend.write_undoable(values, missing_attribute)
+
+
+_profiler = MayaProfiler()
+
+
+def get_profiler() -> MayaProfiler:
+    """
+    Get the profiler shared by the editor modules
+    :return:
+    """
+    return _profiler
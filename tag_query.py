@@ -0,0 +1,123 @@
+import fnmatch
+import re
+
+# Module related to the boolean tag queries, evaluated on the TagIndex bitsets
+#
+# smooth & s02 & !proxy*     objects tagged smooth and s02 without a proxy* tag
+# (chr_* | prop_*) & !s0     & binds tighter than |, ! tighter than &
+#
+# Tags can use the fnmatch wildcards *, ? and [seq].
+
+TOKEN_PATTERN = re.compile(r"\s*(?:([&|!()])|([^\s&|!()]+))")
+WILDCARDS = ("*", "?", "[")
+
+
+class TagQuery(object):
+    """
+    Compiled boolean tag expression
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.position = 0
+        if not self.tokens:
+            raise ValueError("Empty tag query")
+        self.tree = self._parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(
+                f"Unexpected {self.tokens[self.position]!r} in tag query {expression!r}"
+            )
+
+    def get_mask(self, index, mask: int = None) -> int:
+        """
+        Get the bitset of the objects matching the query
+        :param index: tag_caching.TagIndex
+        :param mask: bitset of the objects searched, every cached object if None
+        :return:
+        """
+        if mask is None:
+            mask = index.get_all_mask()
+        return _evaluate(self.tree, index, mask) & mask
+
+    def get_objects(self, index, objects: list = None) -> list:
+        """
+        Get the objects matching the query
+        :param index: tag_caching.TagIndex
+        :param objects: objects searched, read in the index if needed, every
+        cached object if None
+        :return:
+        """
+        mask = None
+        if objects is not None:
+            index.ensure(objects)
+            mask = index.get_mask(objects)
+        return index.get_objects_from_mask(self.get_mask(index, mask))
+
+    # Recursive descent, one method per precedence level
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self._accept("|"):
+            node = ("or", node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_not()
+        while self._accept("&"):
+            node = ("and", node, self._parse_not())
+        return node
+
+    def _parse_not(self):
+        if self._accept("!"):
+            return ("not", self._parse_not())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        if self.position >= len(self.tokens):
+            raise ValueError(f"Unexpected end of tag query {self.expression!r}")
+        token = self.tokens[self.position]
+        self.position += 1
+        if token == "(":
+            node = self._parse_or()
+            if not self._accept(")"):
+                raise ValueError(f"Missing ) in tag query {self.expression!r}")
+            return node
+        if token in "&|!)":
+            raise ValueError(f"Unexpected {token!r} in tag query {self.expression!r}")
+        return ("tag", token)
+
+    def _accept(self, operator: str) -> bool:
+        if self.position < len(self.tokens) and self.tokens[self.position] == operator:
+            self.position += 1
+            return True
+        return False
+
+
+def _tokenize(expression: str) -> list:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        tokens.append(match.group(1) or match.group(2))
+        position = match.end()
+    return tokens
+
+
+def _evaluate(node: tuple, index, mask: int) -> int:
+    operation = node[0]
+    if operation == "tag":
+        pattern = node[1]
+        if not any(wildcard in pattern for wildcard in WILDCARDS):
+            return index.get_tag_mask(pattern)
+        result = 0
+        for tag in index.tag_names:
+            if fnmatch.fnmatchcase(tag, pattern):
+                result |= index.get_tag_mask(tag)
+        return result
+    if operation == "not":
+        return mask & ~_evaluate(node[1], index, mask)
+    if operation == "and":
+        return _evaluate(node[1], index, mask) & _evaluate(node[2], index, mask)
+    return _evaluate(node[1], index, mask) | _evaluate(node[2], index, mask)
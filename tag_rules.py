@@ -0,0 +1,154 @@
+import json
+import re
+
+import tag_utils
+import tag_caching
+import tag_edit
+
+# Module related to the rule based automatic tagging
+#
+# A rule file is a JSON list of rules, every condition of a rule must match :
+# [
+#     {
+#         "tags": ["smooth", "s02"],
+#         "name": "_geo$",            regex searched in the object name
+#         "path": "\\|chars\\|",      regex searched in the object full path
+#         "namespace": "^chr",        regex searched in the object namespace
+#         "parent": "^grp_props$",    regex searched in the names of the parents
+#         "material": "skin",         regex searched in the assigned materials
+#         "type": "mesh",             node type of one of the object shapes
+#         "min_polycount": 1000,
+#         "max_polycount": 50000
+#     }
+# ]
+
+REGEX_CONDITIONS = ("name", "path", "namespace", "parent", "material")
+
+
+class TagRule(object):
+    """
+    Compiled rule giving its tags to the objects matching all its conditions
+    """
+
+    def __init__(self, rule: dict):
+        self.tags = rule["tags"]
+        if isinstance(self.tags, str):
+            self.tags = tag_utils.convert_gtags_in_list(self.tags)
+        self.patterns = {
+            condition: re.compile(rule[condition])
+            for condition in REGEX_CONDITIONS
+            if condition in rule
+        }
+        self.node_type = rule.get("type")
+        self.min_polycount = rule.get("min_polycount")
+        self.max_polycount = rule.get("max_polycount")
+
+    def uses_polycount(self) -> bool:
+        return self.min_polycount is not None or self.max_polycount is not None
+
+    def matches(self, scene_object: dict) -> bool:
+        """
+        Check the rule against the facts gathered on the object
+        :param scene_object: facts built by get_scene_objects
+        :return:
+        """
+        for condition, pattern in self.patterns.items():
+            values = scene_object[condition]
+            if isinstance(values, str):
+                values = [values]
+            if not any(pattern.search(value) for value in values):
+                return False
+        if self.node_type is not None and self.node_type not in scene_object["type"]:
+            return False
+        polycount = scene_object.get("polycount", 0)
+        if self.min_polycount is not None and polycount < self.min_polycount:
+            return False
+        if self.max_polycount is not None and polycount > self.max_polycount:
+            return False
+        return True
+
+
+def load_rules(path: str) -> list:
+    """
+    Load and compile the rules of a JSON rule file
+    :param path:
+    :return:
+    """
+    with open(path, "r") as f:
+        rules = json.load(f)
+    return [TagRule(rule) for rule in rules]
+
+
+def get_scene_objects(rules: list, material_cache=None) -> dict:
+    """
+    Gather in bulk queries the facts needed by the rules on every transform
+    :param rules:
+    :param material_cache: tag_caching.MaterialCache, created if None
+    :return: {transform: facts}
+    """
+    uses_material = any("material" in rule.patterns for rule in rules)
+    uses_type = any(rule.node_type is not None for rule in rules)
+    uses_polycount = any(rule.uses_polycount() for rule in rules)
+    if uses_material and material_cache is None:
+        material_cache = tag_caching.MaterialCache()
+    shape_types = tag_utils.get_shape_types() if uses_type else {}
+    polycounts = tag_utils.get_polycounts() if uses_polycount else {}
+    scene_objects = {}
+    for obj, long_name in tag_utils.get_scene_transforms():
+        short_name = long_name.rpartition("|")[2]
+        parents = long_name.split("|")[1:-1]
+        scene_object = {
+            "name": short_name,
+            "path": long_name,
+            "namespace": short_name.rpartition(":")[0],
+            "parent": parents,
+        }
+        if uses_material:
+            scene_object["material"] = material_cache.get_materials(obj)
+        if uses_type:
+            scene_object["type"] = shape_types.get(long_name, set())
+        if uses_polycount:
+            scene_object["polycount"] = polycounts.get(long_name, 0)
+        scene_objects[obj] = scene_object
+    return scene_objects
+
+
+def get_rules_tags(rules: list, objects: list = None, material_cache=None) -> dict:
+    """
+    Evaluate every rule in one pass over the transforms of the scene
+    :param rules:
+    :param objects: objects to evaluate, every transform if None
+    :param material_cache:
+    :return: {object: tags given by the matching rules}
+    """
+    scene_objects = get_scene_objects(rules, material_cache)
+    if objects is None:
+        objects = list(scene_objects)
+    rules_tags = {}
+    for obj in objects:
+        scene_object = scene_objects.get(obj)
+        if scene_object is None:
+            continue
+        tags = []
+        for rule in rules:
+            if rule.matches(scene_object):
+                tags.extend(rule.tags)
+        if tags:
+            rules_tags[obj] = tags
+    return rules_tags
+
+
+def apply_rules(index, rules: list, objects: list = None, material_cache=None) -> int:
+    """
+    Tag the objects matching the rules, committed as one batched write
+    :param index: tag_caching.TagIndex
+    :param rules:
+    :param objects: objects to tag, every transform if None
+    :param material_cache:
+    :return: number of objects written
+    """
+    rules_tags = get_rules_tags(rules, objects, material_cache)
+    with tag_edit.TagTransaction(index, list(rules_tags)) as transaction:
+        for obj, tags in rules_tags.items():
+            transaction.add_tags(obj, tags)
+    return len(transaction.changed_objects)
@@ -1,7 +1,20 @@
-import maya.cmds as cmds
+import contextlib
+import os
+
+try:
+    import maya.cmds as cmds
+except ImportError:
+    # Allows the tag logic to run outside of Maya with the MemoryBackend
+    cmds = None
+try:
+    import maya.api.OpenMaya as om
+except ImportError:
+    om = None
 
 # Module related to GuerillaTags attribute and selection
 
+GTAGS_ATTRIBUTE = "GuerillaTags"
+
 
 def selection_mode(func):
     pass
@@ -12,34 +25,168 @@ def get_cameras_transform_in_scene():
     Get camera transforms in scene to blacklist them
     :return:
     """
-    selection = cmds.ls(selection=False, cameras=True)
-    transforms = []
-    for camera_shape in selection:
-        cam_transform = cmds.listRelatives(camera_shape, parent=True)
-        transforms.append(cam_transform[0])
-    return transforms
+    camera_shapes = cmds.ls(selection=False, cameras=True)
+    if not camera_shapes:
+        return []
+    return list(dict.fromkeys(cmds.listRelatives(camera_shapes, parent=True) or []))
+
+
+def expand_hierarchy(objects: list) -> list:
+    """
+    Get the objects followed by all their transform descendants, in one query
+    and without duplicates
+    :param objects:
+    :return:
+    """
+    if not objects:
+        return []
+    descendants = cmds.listRelatives(
+        objects, allDescendents=True, type="transform", fullPath=True
+    )
+    if descendants:
+        # Back to the shortest unique names returned by cmds.ls
+        descendants = cmds.ls(descendants)
+    return list(dict.fromkeys(list(objects) + (descendants or [])))
 
 
 def get_clean_selection(mode) -> list:
     """
-    Get a selection with only transforms and direct children transform if checked
-    :param get_children:
+    Get a selection with only transforms and children transforms if mode is "children"
+    :param mode: "selection", "children" or "all"
     :return:
     """
     selection = []
     if mode == "selection":
         selection = cmds.ls(selection=True, tr=True, objectsOnly=True, cameras=False)
     if mode == "children":
-        selection = cmds.ls(selection=True, tr=True, objectsOnly=True, cameras=False)
-        for obj in selection:
-            for children in cmds.listRelatives(obj, allDescendents=True):
-                if cmds.nodeType(children) == "transform" and children not in selection:
-                    selection.append(children)
+        selection = expand_hierarchy(
+            cmds.ls(selection=True, tr=True, objectsOnly=True, cameras=False)
+        )
     if mode == "all":
         selection = cmds.ls(tr=True, cameras=False)
     return selection
 
 
+def get_existing_objects(objects: list) -> list:
+    """
+    Get the objects of the list that exist in the scene, in one query
+    :param objects:
+    :return:
+    """
+    if not objects:
+        return []
+    existing_objects = set(cmds.ls(objects))
+    return [obj for obj in objects if obj in existing_objects]
+
+
+def get_existing_transforms(names: list) -> list:
+    """
+    Get the transforms among names that can be short or full paths, e.g. dropped
+    from the outliner, in one query and without duplicates
+    :param names:
+    :return: names as returned by cmds.ls
+    """
+    if not names:
+        return []
+    return list(dict.fromkeys(cmds.ls(names, transforms=True)))
+
+
+def select_objects(objects: list) -> None:
+    """
+    Replace the selection by the objects in one command
+    :param objects:
+    :return:
+    """
+    if objects:
+        cmds.select(objects, replace=True, noExpand=True)
+    else:
+        cmds.select(clear=True)
+
+
+def get_scene_path() -> str:
+    """
+    Get the path of the opened scene, empty for an untitled scene
+    :return:
+    """
+    return cmds.file(query=True, sceneName=True)
+
+
+def get_scene_files() -> list:
+    """
+    Get the path of the opened scene followed by the files it references
+    :return:
+    """
+    scene_path = get_scene_path()
+    if not scene_path:
+        return []
+    references = cmds.file(query=True, reference=True, withoutCopyNumber=True)
+    return [scene_path] + list(references or [])
+
+
+def is_scene_modified() -> bool:
+    """
+    Check whether the opened scene has unsaved changes
+    :return:
+    """
+    return cmds.file(query=True, modified=True)
+
+
+def get_cache_directory() -> str:
+    """
+    Get the directory where the editor caches the scenes tags
+    :return:
+    """
+    return os.path.join(cmds.internalVar(userAppDir=True), "guerillaTagsCache")
+
+
+def get_scene_transforms() -> list:
+    """
+    Get every transform of the scene with its full path
+    :return: [(name as returned by cmds.ls, full path)]
+    """
+    # Both queries list the transforms in the same DAG order
+    return list(zip(cmds.ls(tr=True), cmds.ls(tr=True, long=True)))
+
+
+def get_shape_types() -> dict:
+    """
+    Get the node types of the shapes under every transform, in one query
+    :return: {transform full path: set of shape types}
+    """
+    shape_types = {}
+    shapes = cmds.ls(shapes=True, long=True, showType=True)
+    for shape, shape_type in zip(shapes[::2], shapes[1::2]):
+        transform = shape.rpartition("|")[0]
+        shape_types.setdefault(transform, set()).add(shape_type)
+    return shape_types
+
+
+def get_polycounts() -> dict:
+    """
+    Get the number of faces of the meshes under every transform
+    :return: {transform full path: number of faces}
+    """
+    polycounts = {}
+    if om is not None:
+        iterator = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kMesh)
+        while not iterator.isDone():
+            dag_path = iterator.getPath()
+            fn_mesh = om.MFnMesh(dag_path)
+            if not fn_mesh.isIntermediateObject:
+                transform = dag_path.fullPathName().rpartition("|")[0]
+                polycounts[transform] = (
+                    polycounts.get(transform, 0) + fn_mesh.numPolygons
+                )
+            iterator.next()
+    else:
+        for mesh in cmds.ls(type="mesh", long=True, noIntermediate=True):
+            transform = mesh.rpartition("|")[0]
+            polycounts[transform] = polycounts.get(transform, 0) + cmds.polyEvaluate(
+                mesh, face=True
+            )
+    return polycounts
+
+
 def get_obj_material(obj: str) -> str:
     shader_groups = cmds.listConnections(cmds.listHistory(obj))
     if shader_groups:
@@ -47,6 +194,70 @@ def get_obj_material(obj: str) -> str:
         return material
 
 
+def get_material_assignments() -> dict:
+    """
+    Resolve once the materials assigned to every transform from the shadingEngines
+    members, per-face assignments and several materials per object included
+    :return: {transform: [materials]}
+    """
+    assignments = {}
+    for shading_engine in cmds.ls(type="shadingEngine"):
+        members = cmds.sets(shading_engine, query=True)
+        if not members:
+            continue
+        materials = cmds.ls(cmds.listConnections(shading_engine), materials=True)
+        if not materials:
+            continue
+        for transform in get_members_transforms(members):
+            obj_materials = assignments.setdefault(transform, [])
+            for material in materials:
+                if material not in obj_materials:
+                    obj_materials.append(material)
+    return assignments
+
+
+def get_scene_materials() -> list:
+    """
+    Get every material in the scene
+    :return:
+    """
+    return cmds.ls(materials=True)
+
+
+def get_members_transforms(members: list) -> list:
+    """
+    Get the transforms of set members that can be shapes, transforms or components
+    :param members:
+    :return:
+    """
+    transforms = []
+    if om is not None:
+        selection_list = om.MSelectionList()
+        for member in members:
+            try:
+                selection_list.add(member)
+            except RuntimeError:
+                continue
+        for i in range(selection_list.length()):
+            try:
+                dag_path = selection_list.getDagPath(i)
+            except TypeError:
+                # Not a DAG member
+                continue
+            if dag_path.node().hasFn(om.MFn.kShape):
+                dag_path.pop()
+            transforms.append(dag_path.partialPathName())
+    else:
+        nodes = cmds.ls(members, objectsOnly=True)
+        shapes = set(cmds.ls(nodes, shapes=True))
+        for node in nodes:
+            if node in shapes:
+                transforms.extend(cmds.listRelatives(node, parent=True) or [])
+            else:
+                transforms.append(node)
+    return list(dict.fromkeys(transforms))
+
+
 # Tags related functions
 
 
@@ -88,13 +299,12 @@ def set_gtags_attribute(obj: str, gtags: str) -> None:
 
 def convert_gtags_in_list(guerilla_tags: str) -> list:
     """
-    Convert Gtags string into a clean list
+    Convert Gtags string into a clean list, without empty entries nor duplicates
     :param guerilla_tags:
     :return:
     """
-    tags = guerilla_tags.replace(" ", "")
-    gtags_list = tags.split(",")
-    return gtags_list
+    gtags_list = [tag.strip() for tag in guerilla_tags.split(",")]
+    return [tag for tag in dict.fromkeys(gtags_list) if tag]
 
 
 def convert_gtags_in_string(guerilla_tags: list) -> str:
@@ -103,13 +313,7 @@ def convert_gtags_in_string(guerilla_tags: list) -> str:
     :param guerilla_tags:
     :return:
     """
-    gtags_string = str()
-    for tags in guerilla_tags:
-        if tags == guerilla_tags[0]:
-            gtags_string += tags
-        else:
-            gtags_string += ", " + tags
-    return gtags_string
+    return ", ".join(tag for tag in dict.fromkeys(guerilla_tags) if tag)
 
 
 def is_gtags_empty(obj) -> bool:
@@ -137,3 +341,298 @@ def add_gtag_to_attr(obj: str, tags: str) -> None:
     else:
         new_tags = old_tags + ", " + tags
     set_gtags_attribute(obj, new_tags)
+
+
+# Bulk GuerillaTags backends
+
+
+class GtagsBackend(object):
+    """
+    Interface used to read and write the GuerillaTags of many objects at once.
+    Values are the attribute strings, None meaning the object has no attribute.
+    """
+
+    def read(self, objects: list) -> dict:
+        """
+        Get the GuerillaTags string of every object
+        :param objects:
+        :return: {object: string or None}
+        """
+        raise NotImplementedError
+
+    def write(self, values: dict) -> None:
+        """
+        Set the GuerillaTags strings, creating the attribute where it is missing
+        :param values: {object: string}
+        :return:
+        """
+        raise NotImplementedError
+
+    def write_undoable(self, values: dict, missing_attribute=None) -> None:
+        """
+        Same as write but the edit can be undone in one step
+        :param values: {object: string}
+        :param missing_attribute: objects known to miss the attribute, None to query
+        :return:
+        """
+        self.write(values)
+
+
+class CmdsBackend(GtagsBackend):
+    """
+    Fallback backend doing one maya.cmds round-trip per object
+    """
+
+    def read(self, objects: list) -> dict:
+        values = {}
+        for obj in objects:
+            if has_gtags_attribute(obj):
+                values[obj] = get_gtags_attribute(obj) or ""
+            else:
+                values[obj] = None
+        return values
+
+    def write(self, values: dict) -> None:
+        for obj, gtags in values.items():
+            if not has_gtags_attribute(obj):
+                create_gtags_attribute(obj)
+            set_gtags_attribute(obj, gtags)
+
+    def write_undoable(self, values: dict, missing_attribute=None) -> None:
+        with undo_chunk("guerillaTagsEdit"):
+            for obj, gtags in values.items():
+                if missing_attribute is None:
+                    if not has_gtags_attribute(obj):
+                        create_gtags_attribute(obj)
+                elif obj in missing_attribute:
+                    create_gtags_attribute(obj)
+                set_gtags_attribute(obj, gtags)
+
+
+class OpenMayaBackend(CmdsBackend):
+    """
+    Backend reading and writing the plugs through the OpenMaya 2.0 API.
+    Writes go through MDGModifier and are not recorded in the undo queue,
+    undoable writes run the edit command of the tag_command plugin and fall
+    back on maya.cmds when it cannot be loaded.
+    """
+
+    def read(self, objects: list) -> dict:
+        values = dict.fromkeys(objects)
+        for obj, node in iter_dependency_nodes(objects):
+            values[obj] = read_gtags_on_node(node)
+        return values
+
+    def write(self, values: dict) -> None:
+        write_gtags_on_nodes(
+            [(node, values[obj]) for obj, node in iter_dependency_nodes(values)]
+        )
+
+    def write_undoable(self, values: dict, missing_attribute=None) -> None:
+        if not cmds.undoInfo(query=True, state=True):
+            # Nothing to record when the undo queue is off, e.g. in batch
+            self.write(values)
+        elif load_edit_command():
+            # One undo entry holding the compact diff of the whole edit
+            stage_edit(values)
+            getattr(cmds, EDIT_COMMAND)()
+        else:
+            super(OpenMayaBackend, self).write_undoable(values, missing_attribute)
+
+
+class MemoryBackend(GtagsBackend):
+    """
+    In-memory GuerillaTags storage, runs the same code outside of Maya
+    """
+
+    def __init__(self, values: dict = None):
+        self.values = dict(values or {})
+
+    def read(self, objects: list) -> dict:
+        return {obj: self.values.get(obj) for obj in objects}
+
+    def write(self, values: dict) -> None:
+        self.values.update(values)
+
+
+def iter_dependency_nodes(objects):
+    """
+    Yield (name, MObject) for every object found in the scene, in one MSelectionList
+    :param objects:
+    :return:
+    """
+    selection_list = om.MSelectionList()
+    for obj in objects:
+        count = selection_list.length()
+        try:
+            selection_list.add(obj)
+        except RuntimeError:
+            # Deleted node or name matching several nodes
+            continue
+        if selection_list.length() == count + 1:
+            yield obj, selection_list.getDependNode(count)
+
+
+def read_gtags_on_node(node):
+    """
+    Get the GuerillaTags string of a node
+    :param node: MObject
+    :return: string or None if the attribute does not exist
+    """
+    fn_node = om.MFnDependencyNode(node)
+    if not fn_node.hasAttribute(GTAGS_ATTRIBUTE):
+        return None
+    return fn_node.findPlug(GTAGS_ATTRIBUTE, False).asString()
+
+
+def write_gtags_on_nodes(nodes_values: list) -> None:
+    """
+    Set the GuerillaTags strings of nodes with two MDGModifiers
+    :param nodes_values: [(MObject, string or None to remove the attribute)]
+    :return:
+    """
+    attribute_modifier = om.MDGModifier()
+    nodes = []
+    for node, gtags in nodes_values:
+        fn_node = om.MFnDependencyNode(node)
+        has_attribute = fn_node.hasAttribute(GTAGS_ATTRIBUTE)
+        if gtags is None:
+            if has_attribute:
+                attribute_modifier.removeAttribute(
+                    node, fn_node.attribute(GTAGS_ATTRIBUTE)
+                )
+            continue
+        if not has_attribute:
+            attribute_modifier.addAttribute(node, _new_gtags_attribute())
+        nodes.append((node, gtags))
+    # Plugs of the new attributes only exist once the modifier is done
+    attribute_modifier.doIt()
+    value_modifier = om.MDGModifier()
+    for node, gtags in nodes:
+        plug = om.MFnDependencyNode(node).findPlug(GTAGS_ATTRIBUTE, False)
+        value_modifier.newPlugValueString(plug, gtags)
+    value_modifier.doIt()
+
+
+def _new_gtags_attribute():
+    """
+    Create the MObject of a GuerillaTags string attribute, one is needed per node
+    :return:
+    """
+    fn_attribute = om.MFnTypedAttribute()
+    attribute = fn_attribute.create(
+        GTAGS_ATTRIBUTE, GTAGS_ATTRIBUTE, om.MFnData.kString
+    )
+    return attribute
+
+
+# Undoable edit command registered by the tag_command plugin
+
+EDIT_COMMAND = "guerillaTagsEdit"
+
+_staged_edit = None
+
+
+def load_edit_command() -> bool:
+    """
+    Load the plugin of the undoable edit command if needed
+    :return: whether the command is available
+    """
+    if not hasattr(cmds, EDIT_COMMAND):
+        plugin_path = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "tag_command.py"
+        )
+        try:
+            cmds.loadPlugin(plugin_path, quiet=True)
+        except RuntimeError:
+            return False
+    return hasattr(cmds, EDIT_COMMAND)
+
+
+def stage_edit(values: dict) -> None:
+    """
+    Give the values to write to the next run of the edit command
+    :param values: {object: string}
+    :return:
+    """
+    global _staged_edit
+    _staged_edit = values
+
+
+def take_staged_edit() -> dict:
+    """
+    Get the values staged for the edit command, once
+    :return: {object: string}
+    """
+    global _staged_edit
+    values = _staged_edit or {}
+    _staged_edit = None
+    return values
+
+
+_backend = None
+
+
+def get_backend() -> GtagsBackend:
+    """
+    Get the backend used by the bulk functions, OpenMaya when available
+    :return:
+    """
+    global _backend
+    if _backend is None:
+        _backend = OpenMayaBackend() if om is not None else CmdsBackend()
+    return _backend
+
+
+def set_backend(backend: GtagsBackend) -> None:
+    """
+    Replace the backend used by the bulk functions, e.g. by a MemoryBackend
+    :param backend:
+    :return:
+    """
+    global _backend
+    _backend = backend
+
+
+def read_gtags(objects: list) -> dict:
+    """
+    Get the GuerillaTags string of every object in one pass
+    :param objects:
+    :return: {object: string or None if the attribute does not exist}
+    """
+    return get_backend().read(objects)
+
+
+def write_gtags(values: dict) -> None:
+    """
+    Set the GuerillaTags string of many objects in one pass
+    :param values: {object: string}
+    :return:
+    """
+    if values:
+        get_backend().write(values)
+
+
+def write_gtags_undoable(values: dict, missing_attribute=None) -> None:
+    """
+    Set the GuerillaTags string of many objects as a single undoable edit
+    :param values: {object: string}
+    :param missing_attribute: objects known to miss the attribute, None to query
+    :return:
+    """
+    if values:
+        get_backend().write_undoable(values, missing_attribute)
+
+
+@contextlib.contextmanager
+def undo_chunk(name: str):
+    """
+    Group every maya command run inside the context in one undo step
+    :param name:
+    :return:
+    """
+    cmds.undoInfo(openChunk=True, chunkName=name)
+    try:
+        yield
+    finally:
+        cmds.undoInfo(closeChunk=True)
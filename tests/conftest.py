@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import fake_cmds
+
+# The fake maya.cmds must be registered before the tools import it
+fake_cmds.install()
+
+import tag_utils
+
+# The tag logic runs on the fake maya.cmds of the benchmarks or on a MemoryBackend
+
+
+@pytest.fixture
+def scene():
+    """
+    Empty fake scene answered by maya.cmds, read through the CmdsBackend
+    """
+    previous_scene = fake_cmds.get_scene()
+    scene = fake_cmds.FakeScene()
+    fake_cmds.set_scene(scene)
+    tag_utils.set_backend(tag_utils.CmdsBackend())
+    yield scene
+    tag_utils.set_backend(None)
+    fake_cmds.set_scene(previous_scene)
+
+
+@pytest.fixture
+def memory_backend():
+    backend = tag_utils.MemoryBackend()
+    tag_utils.set_backend(backend)
+    yield backend
+    tag_utils.set_backend(None)
@@ -0,0 +1,91 @@
+import pytest
+
+import tag_caching
+
+SCENE_GTAGS = {"a": "smooth, s02", "b": "", "c": None, "d": "prop"}
+
+
+@pytest.fixture
+def tagged_scene(scene):
+    for obj, gtags in SCENE_GTAGS.items():
+        scene.add_node(obj, "transform").gtags = gtags
+    return scene
+
+
+def _export(tmp_path, binary: bool, name="snapshot", **kwargs) -> str:
+    path = str(tmp_path / (name + (".gts" if binary else ".jsonl")))
+    tag_caching.export_snapshot(
+        path, tag_caching.TagIndex(), list(SCENE_GTAGS), binary=binary, **kwargs
+    )
+    return path
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_round_trip(tagged_scene, tmp_path, binary):
+    path = _export(tmp_path, binary)
+    assert dict(tag_caching.read_snapshot(path)) == {
+        "a": ["smooth", "s02"],
+        "b": [],
+        "c": None,
+        "d": ["prop"],
+    }
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_export_without_untagged_objects(tagged_scene, tmp_path, binary):
+    path = _export(tmp_path, binary, include_untagged=False)
+    assert [obj for obj, tags in tag_caching.read_snapshot(path)] == ["a", "b", "d"]
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_import_reverts_the_changes(tagged_scene, tmp_path, binary):
+    path = _export(tmp_path, binary)
+    tagged_scene.nodes["a"].gtags = "proxy"
+    tagged_scene.nodes["c"].gtags = "added"
+    index = tag_caching.TagIndex()
+    assert tag_caching.import_snapshot(path, index) == 2
+    assert tagged_scene.nodes["a"].gtags == "smooth, s02"
+    assert tagged_scene.nodes["c"].gtags == ""
+    assert tagged_scene.nodes["d"].gtags == "prop"
+    assert index.get_tags("a") == ["smooth", "s02"]
+    assert index.get_tags("c") == []
+
+
+def test_import_skips_missing_objects(tagged_scene, tmp_path):
+    path = _export(tmp_path, False)
+    del tagged_scene.nodes["d"]
+    tagged_scene.nodes["a"].gtags = "proxy"
+    assert tag_caching.import_snapshot(path, tag_caching.TagIndex()) == 1
+    assert "d" not in tagged_scene.nodes
+
+
+def test_import_rejects_other_files(tmp_path):
+    path = tmp_path / "other.jsonl"
+    path.write_text('{"format": "other"}\n')
+    with pytest.raises(ValueError):
+        tag_caching.import_snapshot(str(path), tag_caching.TagIndex())
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_diff(tagged_scene, tmp_path, binary):
+    old_path = _export(tmp_path, binary, "old")
+    tagged_scene.nodes["a"].gtags = "smooth, s03"
+    tagged_scene.nodes["c"].gtags = "new"
+    del tagged_scene.nodes["d"]
+    tagged_scene.add_node("e", "transform").gtags = "lod0"
+    new_path = str(tmp_path / ("new.gts" if binary else "new.jsonl"))
+    tag_caching.export_snapshot(
+        new_path, tag_caching.TagIndex(), ["a", "b", "c", "e"], binary=binary
+    )
+    assert list(tag_caching.diff_snapshots(old_path, new_path)) == [
+        {"object": "a", "added": ["s03"], "removed": ["s02"]},
+        {"object": "c", "added": ["new"], "removed": []},
+        {"object": "e", "added": ["lod0"], "removed": []},
+        {"object": "d", "added": [], "removed": ["prop"]},
+    ]
+
+
+def test_diff_identical_snapshots(tagged_scene, tmp_path):
+    text_path = _export(tmp_path, False)
+    binary_path = _export(tmp_path, True)
+    assert list(tag_caching.diff_snapshots(text_path, binary_path)) == []
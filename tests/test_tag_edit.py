@@ -0,0 +1,66 @@
+import json
+
+import tag_caching
+import tag_edit
+
+SUBDIV = tag_edit.ExclusiveGroup("Subdivision", ["s0", "s01", "s02"])
+LAYER = tag_edit.ExclusiveGroup("Render layer", ["bg", "fg"])
+
+
+def _set_exclusive_tags(backend, values: dict, tags: list, groups=(SUBDIV, LAYER)):
+    backend.values.update(values)
+    index = tag_caching.TagIndex()
+    count = tag_edit.set_exclusive_tags(index, list(values), tags, list(groups))
+    return index, count
+
+
+def test_sibling_tags_are_replaced(memory_backend):
+    index, count = _set_exclusive_tags(
+        memory_backend, {"a": "smooth, s01", "b": "s0, fg"}, ["s02"]
+    )
+    assert count == 2
+    assert memory_backend.values == {"a": "smooth, s02", "b": "fg, s02"}
+    assert index.get_tags("a") == ["smooth", "s02"]
+    assert index.get_objects("s01") == set()
+
+
+def test_objects_already_set_are_not_written(memory_backend):
+    memory_backend.values["b"] = "s02"
+    index, count = _set_exclusive_tags(
+        memory_backend, {"a": "s01", "b": "s02, smooth"}, ["s02"]
+    )
+    assert count == 1
+    assert memory_backend.values["b"] == "s02, smooth"
+
+
+def test_last_tag_of_a_group_wins(memory_backend):
+    index, count = _set_exclusive_tags(
+        memory_backend, {"a": "s0, bg"}, ["s01", "fg", "s02"]
+    )
+    # The group order of the first tag is kept
+    assert memory_backend.values["a"] == "s02, fg"
+
+
+def test_tags_outside_groups_are_added(memory_backend):
+    index, count = _set_exclusive_tags(
+        memory_backend, {"a": "s01", "b": None}, ["smooth", "s02"]
+    )
+    assert count == 2
+    assert memory_backend.values == {"a": "smooth, s02", "b": "smooth, s02"}
+    assert index.has_attribute("b")
+
+
+def test_set_exclusive_tag(memory_backend):
+    memory_backend.values.update({"a": "lod0, smooth"})
+    index = tag_caching.TagIndex()
+    count = tag_edit.set_exclusive_tag(index, ["a"], "lod1", ["lod0", "lod1"])
+    assert count == 1
+    assert memory_backend.values["a"] == "smooth, lod1"
+
+
+def test_load_exclusive_groups(tmp_path):
+    path = tmp_path / "tag_groups.json"
+    path.write_text(json.dumps([{"name": "LOD", "tags": ["lod0", "lod1"]}]))
+    groups = tag_edit.load_exclusive_groups(str(path))
+    assert [(group.name, group.tags) for group in groups] == [("LOD", ["lod0", "lod1"])]
+    assert groups[0].tag_set == frozenset(["lod0", "lod1"])
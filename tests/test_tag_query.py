@@ -0,0 +1,68 @@
+import pytest
+
+import tag_caching
+import tag_query
+
+OBJECT_TAGS = {
+    "a": ["smooth", "s02"],
+    "b": ["smooth", "s02", "proxy_low"],
+    "c": ["smooth", "s01"],
+    "d": ["prop_chair", "s02"],
+    "e": [],
+}
+
+
+@pytest.fixture
+def index():
+    index = tag_caching.TagIndex()
+    index.set_tags_many((obj, tags, True) for obj, tags in OBJECT_TAGS.items())
+    return index
+
+
+def _query(index, expression: str, objects=None) -> list:
+    return sorted(tag_query.TagQuery(expression).get_objects(index, objects))
+
+
+def test_tag_and_not_wildcard(index):
+    assert _query(index, "smooth & s02 & !proxy*") == ["a"]
+
+
+def test_and_binds_tighter_than_or(index):
+    # prop_chair | (smooth & s01)
+    assert _query(index, "prop_chair | smooth & s01") == ["c", "d"]
+    assert _query(index, "smooth & s01 | prop_chair") == ["c", "d"]
+
+
+def test_parentheses_override_precedence(index):
+    assert _query(index, "(prop_chair | smooth) & s01") == ["c"]
+
+
+def test_not_binds_tighter_than_and(index):
+    assert _query(index, "!smooth & s02") == ["d"]
+    assert _query(index, "!(smooth & s02)") == ["c", "d", "e"]
+    assert _query(index, "!!smooth") == ["a", "b", "c"]
+
+
+def test_wildcards(index):
+    assert _query(index, "prop_*") == ["d"]
+    assert _query(index, "s0?") == ["a", "b", "c", "d"]
+    assert _query(index, "s0[1]") == ["c"]
+    assert _query(index, "missing*") == []
+
+
+def test_unknown_tag_matches_nothing(index):
+    assert _query(index, "missing") == []
+    assert _query(index, "!missing") == ["a", "b", "c", "d", "e"]
+
+
+def test_query_restricted_to_objects(index):
+    assert _query(index, "smooth", ["a", "d", "e"]) == ["a"]
+    assert _query(index, "!smooth", ["a", "d", "e"]) == ["d", "e"]
+
+
+@pytest.mark.parametrize(
+    "expression", ["", "   ", "(smooth", "smooth)", "smooth &", "smooth s02", "& s02"]
+)
+def test_invalid_queries_raise(expression):
+    with pytest.raises(ValueError):
+        tag_query.TagQuery(expression)
@@ -0,0 +1,36 @@
+import tag_caching
+import tag_utils
+
+
+def test_convert_gtags_in_list_strips_tags():
+    assert tag_utils.convert_gtags_in_list(" smooth ,s02,  proxy") == [
+        "smooth",
+        "s02",
+        "proxy",
+    ]
+
+
+def test_convert_gtags_in_list_drops_empty_entries():
+    assert tag_utils.convert_gtags_in_list("smooth,, s02, ,") == ["smooth", "s02"]
+    assert tag_utils.convert_gtags_in_list("") == []
+    assert tag_utils.convert_gtags_in_list(" , ") == []
+
+
+def test_convert_gtags_in_list_dedupes_keeping_first_order():
+    assert tag_utils.convert_gtags_in_list("s02, smooth, s02 ,smooth, lod0") == [
+        "s02",
+        "smooth",
+        "lod0",
+    ]
+
+
+def test_convert_gtags_in_string_round_trip():
+    gtags = tag_utils.convert_gtags_in_string(["smooth", "", "s02", "smooth"])
+    assert gtags == "smooth, s02"
+    assert tag_utils.convert_gtags_in_list(gtags) == ["smooth", "s02"]
+
+
+def test_parse_gtags_missing_attribute():
+    assert tag_caching.parse_gtags(None) == []
+    assert tag_caching.parse_gtags("") == []
+    assert tag_caching.parse_gtags("a, b, a") == ["a", "b"]